@@ -1,12 +1,19 @@
 from __future__ import annotations
 
+import asyncio
+import itertools
+import secrets
 import time
-import uuid
+from contextlib import asynccontextmanager
+from typing import Any
 
+import orjson
 from fastapi import BackgroundTasks, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
+from pydantic import TypeAdapter
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from deepagent.api.sessions import SessionStore
 from deepagent.common.config import get_settings, resolve_path
@@ -15,61 +22,114 @@ from deepagent.common.schemas import (
     ChatRequest,
     ChatResponse,
     MemoryWriteRequest,
+    TodoItem,
     TodoWriteRequest,
 )
 from deepagent.core.agent import DeepAgent
-from deepagent.core.memory import create_store, store_put, store_search
+from deepagent.core.memory import create_store, format_timestamp, store_put, store_search
 from deepagent.core.todos import TodoStore
 
 settings = get_settings()
 logger = get_logger("deepagent.api")
-app = FastAPI(title="DeepAgent")
-
-@app.middleware("http")
-async def log_middleware(request: Request, call_next):
-    req_id = str(uuid.uuid4())
-    request_id_ctx.set(req_id)
-    
-    # Set source context
-    token = source_ctx.set({
-        "module": "deepagent.api",
-        "endpoint": request.url.path,
-        "method": request.method
-    })
-    
-    start_time = time.time()
-    logger.info(f"Incoming Request: {request.method} {request.url.path} Query={request.query_params}")
-
-    # Capture and log request body for chat endpoint (useful for debugging user input)
-    if request.url.path == "/api/chat" and request.method == "POST":
-        try:
-            body_bytes = await request.body()
-            # Restore body for downstream processing
-            # FastAPI/Starlette consumes body stream, so we need to create a new receive function
-            async def new_receive():
-                return {"type": "http.request", "body": body_bytes}
-            request._receive = new_receive
-            
-            body_str = body_bytes.decode("utf-8")
-            logger.debug(f"Request Body: {body_str}")
-        except Exception:
-            logger.warn("Failed to read request body")
-    
-    try:
-        response = await call_next(request)
-        process_time = (time.time() - start_time) * 1000
-        
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Stores and the agent are built once per worker process at startup, not at import time
+    app.state.todo_store = TodoStore()
+    app.state.memory_store = create_store()
+    app.state.agent = DeepAgent(todo_store=app.state.todo_store, store=app.state.memory_store)
+    app.state.session_store = SessionStore()
+    app.state.agent.start_summary_worker()
+    yield
+    await app.state.agent.stop_summary_worker()
+    await asyncio.to_thread(app.state.session_store.compact)
+    app.state.agent.skill_registry.close()
+    await app.state.agent.mcp_registry.aclose()
+    app.state.agent.mcp_registry.shutdown()
+
+
+class _OrjsonResponse(JSONResponse):
+    """JSON response rendered with orjson (FastAPI's own ORJSONResponse is deprecated)."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+app = FastAPI(title="DeepAgent", default_response_class=_OrjsonResponse, lifespan=lifespan)
+
+# Request IDs only need to be unique per process: a random per-process prefix plus a counter
+_request_id_prefix = secrets.token_hex(4)
+_request_counter = itertools.count(1)
+
+class LogMiddleware:
+    """Pure ASGI request logging middleware.
+
+    Avoids ``BaseHTTPMiddleware`` so response bodies (including SSE streams)
+    are passed straight through instead of via an intermediate memory channel.
+    """
+
+    # Upper bound on cached source-context dicts; unseen paths past this are built per request
+    MAX_CACHED_SOURCES = 256
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._sources: dict[str, dict[str, dict[str, str]]] = {}
+        self._cached_sources = 0
+
+    def _source(self, path: str, method: str) -> dict[str, str]:
+        """Read-only source context for an endpoint, reused across requests."""
+        by_path = self._sources.get(method)
+        if by_path is None:
+            by_path = self._sources.setdefault(method, {})
+        source = by_path.get(path)
+        if source is None:
+            source = {"module": "deepagent.api", "endpoint": path, "method": method}
+            if self._cached_sources < self.MAX_CACHED_SOURCES:
+                by_path[path] = source
+                self._cached_sources += 1
+        return source
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        method = scope["method"]
+        request_id_ctx.set(f"{_request_id_prefix}-{next(_request_counter):x}")
+
+        # Set source context
+        token = source_ctx.set(self._source(path, method))
+
+        start_time = time.perf_counter()
         logger.info(
-            f"Outgoing Response: {response.status_code} "
-            f"Duration={process_time:.2f}ms"
+            "Incoming Request: %s %s Query=%s",
+            method, path, scope.get("query_string", b"").decode("latin-1"),
         )
-        return response
-    except Exception as e:
-        logger.error(f"Request Failed: {str(e)}", exc_info=True)
-        raise e
-    finally:
-        source_ctx.reset(token)
 
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+            logger.info(
+                "Outgoing Response: %s Duration=%.2fms",
+                status_code, (time.perf_counter() - start_time) * 1000,
+            )
+        except Exception as e:
+            logger.error("Request Failed: %s", e, exc_info=True)
+            raise e
+        finally:
+            source_ctx.reset(token)
+
+
+app.add_middleware(LogMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_allow_origins,
@@ -78,19 +138,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-todo_store = TodoStore()
-memory_store = create_store()
-agent = DeepAgent(todo_store=todo_store, store=memory_store)
-session_store = SessionStore()
+_todo_list = TypeAdapter(list[TodoItem])
 
 
 import json
 from fastapi.responses import StreamingResponse
 
 @app.post("/api/chat/stream")
-async def chat_stream(req: ChatRequest, background_tasks: BackgroundTasks):
+async def chat_stream(req: ChatRequest, background_tasks: BackgroundTasks, request: Request):
+    agent = request.app.state.agent
     thread_id = req.thread_id or agent.new_thread_id()
-    session_store.add(req.user_id, thread_id)
+    await asyncio.to_thread(request.app.state.session_store.add, req.user_id, thread_id)
     logger.debug("chat stream request", extra={"thread_id": thread_id, "user_id": req.user_id})
 
     async def event_generator():
@@ -107,51 +165,73 @@ async def chat_stream(req: ChatRequest, background_tasks: BackgroundTasks):
 
 
 @app.get("/api/health")
-def health():
+async def health():
     logger.debug("health check")
     return {"status": "ok"}
 
 @app.post("/api/chat", response_model=ChatResponse)
-def chat(req: ChatRequest, background_tasks: BackgroundTasks):
+async def chat(req: ChatRequest, background_tasks: BackgroundTasks, request: Request):
+    agent = request.app.state.agent
     thread_id = req.thread_id or agent.new_thread_id()
-    session_store.add(req.user_id, thread_id)
+    await asyncio.to_thread(request.app.state.session_store.add, req.user_id, thread_id)
     logger.debug("chat request", extra={"thread_id": thread_id, "user_id": req.user_id})
-    result = agent.invoke(thread_id, req.user_id, req.message, background_tasks=background_tasks)
-    return ChatResponse(
+    logger.debug("Request Message: %s", req.message)
+    result = await agent.ainvoke(thread_id, req.user_id, req.message, background_tasks=background_tasks)
+    # Values come from the agent's own models, so skip re-validating them
+    response = ChatResponse.model_construct(
         thread_id=thread_id,
         user_id=req.user_id,
         reply=result["reply"],
         plan=result["plan"],
-        todos=result["todos"],
-        memories=result["memories"],
+        todos=[TodoItem.model_construct(**t) for t in result["todos"]],
+        memories=[_memory_value(m) for m in result["memories"]],
     )
+    # Serialize directly; returning a Response skips FastAPI's re-validation and jsonable_encoder pass
+    return Response(response.model_dump_json(), media_type="application/json")
 
 
 @app.post("/api/todos")
-def write_todos(req: TodoWriteRequest):
-    saved = todo_store.write(req.thread_id, req.todos)
-    return [t.model_dump() for t in saved]
+def write_todos(req: TodoWriteRequest, request: Request):
+    saved = request.app.state.todo_store.write(req.thread_id, req.todos)
+    return Response(_todo_list.dump_json(saved), media_type="application/json")
 
 
 @app.get("/api/todos")
-def get_todos(thread_id: str):
-    return [t.model_dump() for t in todo_store.get(thread_id)]
+def get_todos(thread_id: str, request: Request):
+    todos = request.app.state.todo_store.get(thread_id)
+    return Response(_todo_list.dump_json(todos), media_type="application/json")
 
 
 @app.get("/api/sessions")
-def list_sessions(user_id: str):
-    return session_store.list(user_id)
+def list_sessions(user_id: str, request: Request):
+    return request.app.state.session_store.list(user_id)
 
 
 @app.post("/api/memory")
-def memory_put(req: MemoryWriteRequest):
-    return {"id": store_put(memory_store, req.user_id, req.value)}
+def memory_put(req: MemoryWriteRequest, request: Request):
+    return {"id": store_put(request.app.state.memory_store, req.user_id, req.value)}
 
 
 @app.get("/api/memory")
-def memory_search(user_id: str, query: str | None = None, limit: int = 5):
-    results = store_search(memory_store, user_id, query=query, limit=limit)
-    return [r.dict() for r in results]
+def memory_search(request: Request, user_id: str, query: str | None = None, limit: int = 5):
+    results = store_search(request.app.state.memory_store, user_id, query=query, limit=limit)
+    return [_memory_item(r.dict()) for r in results]
+
+
+def _memory_item(item: dict[str, Any]) -> dict[str, Any]:
+    item["value"] = _memory_value(item.get("value"))
+    return item
+
+
+def _memory_value(value: Any) -> Any:
+    # The agent stores its turns and summaries with epoch timestamps; clients get ISO-8601
+    if (
+        isinstance(value, dict)
+        and value.get("type") in ("conversation", "summary")
+        and isinstance(value.get("timestamp"), (int, float))
+    ):
+        return {**value, "timestamp": format_timestamp(value["timestamp"])}
+    return value
 
 
 def _mount_frontend(app: FastAPI) -> None:
@@ -176,9 +256,12 @@ def _mount_frontend(app: FastAPI) -> None:
     </html>
     """
 
+    # The page never changes, so encode it and build the response once
+    index_response = HTMLResponse(html)
+
     @app.get("/", response_class=HTMLResponse)
     def dev_index():
-        return HTMLResponse(html)
+        return index_response
 
 
 _mount_frontend(app)
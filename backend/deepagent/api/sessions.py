@@ -1,30 +1,146 @@
 from __future__ import annotations
 
-import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+import orjson
 
 from deepagent.common.config import resolve_path
+from deepagent.common.filelock import file_lock
+from deepagent.common.logger import get_logger
+
+logger = get_logger("deepagent.api.sessions")
 
 
 class SessionStore:
-    def __init__(self, path: str = "./data/sessions.json") -> None:
+    """
+    Persists the thread IDs seen for each user, each user's list ordered by last activity.
+    Unbounded by default; with max_users / max_threads_per_user set, the least recently active
+    users and threads are evicted, which deletes them from the file as well.
+    The JSON snapshot is loaded once; each change is appended to a JSONL journal beside it and
+    folded back into the snapshot every COMPACT_EVERY changes and by compact(), which the API
+    calls on shutdown; an uncompacted journal is simply replayed on the next load.
+    Worker processes may share the files, so every access holds an exclusive lock on
+    "<path>.lock" and first replays journal lines other processes appended, reloading
+    everything if another process has compacted.
+    """
+
+    COMPACT_EVERY = 256
+
+    def __init__(
+        self,
+        path: str = "./data/sessions.json",
+        max_users: int | None = None,
+        max_threads_per_user: int | None = None,
+    ) -> None:
         self.path = resolve_path(path)
+        self.max_users = max_users
+        self.max_threads_per_user = max_threads_per_user
         self.path.parent.mkdir(parents=True, exist_ok=True)
         if not self.path.exists():
-            self.path.write_text(json.dumps({}), encoding="utf-8")
+            self.path.write_bytes(b"{}")
+        self.journal_path = self.path.with_name(self.path.name + "l")
+        self._lock_path = self.path.with_name(self.path.name + ".lock")
+        self._lock = threading.Lock()
+        self._data: dict[str, list[str]] = {}
+        # (inode, mtime_ns, size) of the snapshot _data was loaded from
+        self._snapshot: tuple[int, int, int] | None = None
+        # Bytes of the journal already applied to _data, and how many changes they hold
+        self._journal_offset = 0
+        self._journal_items = 0
+        with self._locked():
+            self._sync()
 
-    def _load(self) -> dict[str, list[str]]:
-        return json.loads(self.path.read_text(encoding="utf-8") or "{}")
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._lock, file_lock(self._lock_path):
+            yield
 
-    def _save(self, data: dict[str, list[str]]) -> None:
-        self.path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    def _snapshot_key(self) -> tuple[int, int, int]:
+        st = self.path.stat()
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
 
-    def add(self, user_id: str, thread_id: str) -> None:
-        data = self._load()
-        threads = data.get(user_id, [])
-        if thread_id not in threads:
-            threads.append(thread_id)
+    def _sync(self) -> None:
+        """Bring _data up to date with the files; callers must hold _locked()."""
+        snapshot = self._snapshot_key()
+        if snapshot != self._snapshot:
+            self._data = orjson.loads(self.path.read_bytes() or b"{}")
+            self._snapshot = snapshot
+            self._journal_offset = self._journal_items = 0
+        try:
+            with self.journal_path.open("rb") as journal:
+                journal.seek(self._journal_offset)
+                data = journal.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            # Appends happen under the lock we hold, so an unterminated tail is a write torn
+            # by a crash; drop it so the next append starts on a fresh line
+            os.truncate(self.journal_path, self._journal_offset + end)
+        for line in data[:end].splitlines():
+            if line:
+                entry = orjson.loads(line)
+                self._apply(entry["u"], entry["t"], log=False)
+                self._journal_items += 1
+        self._journal_offset += end
+
+    def _apply(self, user_id: str, thread_id: str, log: bool = True) -> None:
+        data = self._data
+        # Re-insert so dict order tracks recency; the first key is the least recently active user
+        threads = data.pop(user_id, [])
+        # Likewise within a user's list: the active thread moves to the end
+        if thread_id in threads:
+            threads.remove(thread_id)
+        threads.append(thread_id)
+        if self.max_threads_per_user is not None and len(threads) > self.max_threads_per_user:
+            evicted = len(threads) - self.max_threads_per_user
+            del threads[:evicted]
+            if log:
+                logger.info("Evicted %s old session(s) for user '%s'", evicted, user_id)
         data[user_id] = threads
-        self._save(data)
+        while self.max_users is not None and len(data) > self.max_users:
+            evicted_user = next(iter(data))
+            del data[evicted_user]
+            if log:
+                logger.info("Evicted sessions for least recently active user '%s'", evicted_user)
+
+    def _compact(self) -> None:
+        if not self._journal_items:
+            return
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_bytes(orjson.dumps(self._data, option=orjson.OPT_INDENT_2))
+        os.replace(tmp, self.path)
+        self.journal_path.write_bytes(b"")
+        self._snapshot = self._snapshot_key()
+        self._journal_offset = self._journal_items = 0
+
+    def compact(self) -> None:
+        """Write the sessions back to the JSON snapshot and empty the journal."""
+        with self._locked():
+            # Catch up first so changes journaled by other processes reach the snapshot
+            self._sync()
+            self._compact()
+
+    def add(self, user_id: str, thread_id: str) -> None:
+        with self._locked():
+            self._sync()
+            threads = self._data.get(user_id)
+            # Another turn on the most recently active user's most recent thread changes nothing
+            if threads and threads[-1] == thread_id and next(reversed(self._data)) == user_id:
+                return
+            self._apply(user_id, thread_id)
+            line = orjson.dumps({"u": user_id, "t": thread_id}) + b"\n"
+            with self.journal_path.open("ab") as journal:
+                journal.write(line)
+            self._journal_offset += len(line)
+            self._journal_items += 1
+            if self._journal_items >= self.COMPACT_EVERY:
+                self._compact()
 
     def list(self, user_id: str) -> list[str]:
-        return self._load().get(user_id, [])
+        with self._locked():
+            self._sync()
+            return list(self._data.get(user_id, []))
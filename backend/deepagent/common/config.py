@@ -22,6 +22,8 @@ class Settings(BaseModel):
     log_dir: str = "./logs"
     recursion_limit: int = 25
     max_concurrency: int = 5
+    max_cached_agents: int = 16
+    summary_batch_min: int = 8
     workspace_root: str = "../"
     model_config_path: str = "./config/models.yaml"
     mcp_config_path: str = "./config/mcp_servers.yaml"
@@ -52,6 +54,8 @@ def get_settings() -> Settings:
         log_dir=os.getenv("DEEPAGENT_LOG_DIR", "./logs"),
         recursion_limit=int(os.getenv("DEEPAGENT_RECURSION_LIMIT", "25")),
         max_concurrency=int(os.getenv("DEEPAGENT_MAX_CONCURRENCY", "5")),
+        max_cached_agents=int(os.getenv("DEEPAGENT_MAX_CACHED_AGENTS", "16")),
+        summary_batch_min=int(os.getenv("DEEPAGENT_SUMMARY_BATCH_MIN", "8")),
         workspace_root=os.getenv("DEEPAGENT_WORKSPACE_ROOT", "../"),
         model_config_path=os.getenv("DEEPAGENT_MODEL_CONFIG", "./config/models.yaml"),
         mcp_config_path=os.getenv("DEEPAGENT_MCP_CONFIG", "./config/mcp_servers.yaml"),
@@ -70,6 +74,9 @@ def get_settings() -> Settings:
     )
 
 
+_BASE_DIR = Path(__file__).resolve().parents[2]
+
+
+@lru_cache(maxsize=None)
 def resolve_path(path: str) -> Path:
-    base = Path(__file__).resolve().parents[2]
-    return (base / path).resolve()
\ No newline at end of file
+    return (_BASE_DIR / path).resolve()
\ No newline at end of file
@@ -1,15 +1,20 @@
 from __future__ import annotations
 
-import json
+import atexit
+import copy
 import logging
+import queue
 import re
 import sys
+import threading
+import time
 from contextvars import ContextVar
-from datetime import datetime
 from logging import Logger, LogRecord
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
 from pathlib import Path
 
+import orjson
+
 from deepagent.common.config import get_settings
 
 # ContextVar for Request ID
@@ -17,6 +22,25 @@ request_id_ctx: ContextVar[str | None] = ContextVar("request_id", default=None)
 source_ctx: ContextVar[dict[str, str] | None] = ContextVar("source_ctx", default=None)
 
 _cache: dict[str, Logger] = {}
+_cache_lock = threading.Lock()
+
+_LOG_LEVEL_MAP = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+    'critical': logging.CRITICAL
+}
+
+# File logging is handed off to one background listener thread per log directory so that
+# request handlers never block on disk I/O or JSON formatting.
+# log_dir -> handler feeding that directory's listener (None if file logging failed there)
+_file_queue_handlers: dict[str, QueueHandler | None] = {}
+
+# Console and queue handlers are shared by every logger created under the same
+# (log_dir, log_level) settings; a logger is bound to the settings current when it is created
+_handlers: dict[tuple[str, str], list[logging.Handler]] = {}
+_handlers_lock = threading.Lock()
 
 # ANSI Colors
 class Colors:
@@ -30,30 +54,125 @@ class Colors:
 class SensitiveDataFilter(logging.Filter):
     """Masks sensitive data in log records."""
     
-    PATTERNS = [
-        (r'"password"\s*:\s*"[^"]*"', '"password": "***"'),
-        (r'"token"\s*:\s*"[^"]*"', '"token": "***"'),
-        (r'"api_key"\s*:\s*"[^"]*"', '"api_key": "***"'),
-        (r'"authorization"\s*:\s*"[^"]*"', '"authorization": "***"'),
-    ]
+    PATTERN = re.compile(
+        r'"(password|token|api_key|authorization)"\s*:\s*"[^"]*"', re.IGNORECASE
+    )
 
     def filter(self, record: LogRecord) -> bool:
-        if isinstance(record.msg, str):
-            for pattern, replacement in self.PATTERNS:
-                record.msg = re.sub(pattern, replacement, record.msg, flags=re.IGNORECASE)
+        # Secrets may arrive through %-style args, so mask the merged message, not the template
+        message = record.getMessage()
+        # Every masked pattern is a quoted JSON key, so plain messages can skip the scan
+        if '"' in message:
+            message = self.PATTERN.sub(self._mask, message)
+        record.msg = message
+        record.args = ()
         return True
 
-class JSONFormatter(logging.Formatter):
+    @staticmethod
+    def _mask(match: re.Match[str]) -> str:
+        return f'"{match.group(1).lower()}": "***"'
+
+def _record_source(record: LogRecord) -> dict[str, str]:
+    """Source context captured at enqueue time, or the live context."""
+    if hasattr(record, "source_ctx"):
+        return getattr(record, "source_ctx") or {}
+    return source_ctx.get() or {}
+
+
+def _record_request_id(record: LogRecord) -> str | None:
+    """Request ID captured at enqueue time, or the live context."""
+    if hasattr(record, "request_id"):
+        return getattr(record, "request_id")
+    return request_id_ctx.get()
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    QueueHandler that snapshots the request context before handing off the record.
+    ContextVars are not visible from the listener thread, so they are copied onto the record.
+    """
+    def prepare(self, record: LogRecord) -> LogRecord:
+        record = copy.copy(record)
+        record.request_id = request_id_ctx.get()
+        record.source_ctx = source_ctx.get()
+        # Merge args now; they may not be safe to format later on another thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class BufferedTimedRotatingFileHandler(TimedRotatingFileHandler):
+    """
+    TimedRotatingFileHandler that writes through a large buffer instead of flushing per record.
+    Flushing is left to the owning BatchingQueueListener, which flushes whenever the queue drains.
+    """
+    BUFFER_SIZE = 64 * 1024
+
+    def _open(self):
+        return open(
+            self.baseFilename,
+            self.mode,
+            buffering=self.BUFFER_SIZE,
+            encoding=self.encoding,
+            errors=self.errors,
+        )
+
+    def emit(self, record: LogRecord) -> None:
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+class BatchingQueueListener(QueueListener):
+    """QueueListener that flushes its handlers once per drained batch rather than per record."""
+    def dequeue(self, block: bool) -> LogRecord:
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            for handler in self.handlers:
+                handler.flush()
+            return self.queue.get(block)
+
+class _SecondCachedFormatter(logging.Formatter):
+    """Formatter base that renders the UTC timestamp prefix at most once per second."""
+    TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._last_second = -1
+        self._last_stamp = ""
+
+    def _utc_seconds(self, record: LogRecord) -> str:
+        second = int(record.created)
+        if second != self._last_second:
+            self._last_stamp = time.strftime(self.TIME_FORMAT, time.gmtime(second))
+            self._last_second = second
+        return self._last_stamp
+
+class JSONFormatter(_SecondCachedFormatter):
     """
     Standardized JSON log format.
     Fields: timestamp, severity, source, requestId, content, environment.
     """
+    TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._env = get_settings().env
+
     def format(self, record: LogRecord) -> str:
-        settings = get_settings()
-        
         # Build Source Field
         # Try to get from extra/context, fallback to logger name
-        source_data = source_ctx.get() or {}
+        source_data = _record_source(record)
         module = source_data.get("module") or record.name
         endpoint = source_data.get("endpoint") or getattr(record, "endpoint", "")
         method = source_data.get("method") or getattr(record, "method", "")
@@ -75,17 +194,17 @@ class JSONFormatter(logging.Formatter):
             msg += f"\nStack Trace:\n{record.exc_text}"
             
         log_entry = {
-            "timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            "timestamp": f"{self._utc_seconds(record)}.{int(record.created % 1 * 1_000_000):06d}Z",
             "severity": record.levelname,
             "source": source_str,
-            "requestId": request_id_ctx.get() or "N/A",
+            "requestId": _record_request_id(record) or "N/A",
             "content": msg,
-            "environment": settings.env
+            "environment": self._env
         }
         
-        return json.dumps(log_entry)
+        return orjson.dumps(log_entry).decode()
 
-class ColorFormatter(logging.Formatter):
+class ColorFormatter(_SecondCachedFormatter):
     """
     Console log formatter with colors.
     """
@@ -101,7 +220,7 @@ class ColorFormatter(logging.Formatter):
         color = self.LEVEL_COLORS.get(record.levelno, Colors.RESET)
         
         # Build Source Field
-        source_data = source_ctx.get() or {}
+        source_data = _record_source(record)
         module = source_data.get("module") or record.name
         endpoint = source_data.get("endpoint") or getattr(record, "endpoint", "")
         method = source_data.get("method") or getattr(record, "method", "")
@@ -114,7 +233,7 @@ class ColorFormatter(logging.Formatter):
         
         source_str = f"[{' | '.join(source_parts)}]"
         
-        timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = self._utc_seconds(record)
         
         msg = record.getMessage()
         if record.exc_info and not record.exc_text:
@@ -124,58 +243,85 @@ class ColorFormatter(logging.Formatter):
 
         return f"{color}[{timestamp}] [{record.levelname}] {source_str} {msg}{Colors.RESET}"
 
-def get_logger(name: str) -> Logger:
-    if name in _cache:
-        return _cache[name]
-    
+def _start_file_listener(log_dir: str) -> QueueHandler | None:
+    """Start the file logging listener for log_dir. Returns None if file logging is unavailable."""
+    # Ensure log directory exists
+    path = Path(log_dir)
+    try:
+        path.mkdir(parents=True, exist_ok=True)
+
+        # Daily rotation, keep 7 days
+        file_handler = BufferedTimedRotatingFileHandler(
+            filename=path / "backend.log",
+            when="midnight",
+            interval=1,
+            backupCount=7,
+            encoding="utf-8"
+        )
+        # Requirement: "all logs (regardless of severity) must be persisted to files in production environment"
+        # This implies DEBUG level for file handler.
+        file_handler.setLevel(logging.DEBUG)
+        file_handler.setFormatter(JSONFormatter())
+        file_handler.addFilter(SensitiveDataFilter())
+    except Exception as e:
+        # Fallback if file logging fails (e.g. permissions)
+        sys.stderr.write(f"Failed to setup file logging: {e}\n")
+        return None
+
+    log_queue: queue.Queue[LogRecord] = queue.Queue(-1)
+    listener = BatchingQueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return ContextQueueHandler(log_queue)
+
+def _shared_handlers() -> list[logging.Handler]:
     settings = get_settings()
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG) # Capture all logs, handlers decide what to output
-    logger.propagate = False # Prevent double logging if attached to root
+    key = (settings.log_dir, settings.log_level)
+    handlers = _handlers.get(key)
+    if handlers is not None:
+        return handlers
+    with _handlers_lock:
+        handlers = _handlers.get(key)
+        if handlers is not None:
+            return handlers
 
-    if not logger.handlers:
         # 1. Console Handler
         console_handler = logging.StreamHandler(sys.stdout)
         # Use DEEPAGENT_LOG_LEVEL to determine log level
-        log_level_map = {
-            'debug': logging.DEBUG,
-            'info': logging.INFO,
-            'warning': logging.WARNING,
-            'error': logging.ERROR,
-            'critical': logging.CRITICAL
-        }
-        console_level = log_level_map.get(settings.log_level.lower(), logging.ERROR)
+        console_level = _LOG_LEVEL_MAP.get(settings.log_level.lower(), logging.ERROR)
         console_handler.setLevel(console_level)
         console_handler.setFormatter(ColorFormatter())
         console_handler.addFilter(SensitiveDataFilter())
-        logger.addHandler(console_handler)
+        handlers = [console_handler]
 
-        # 2. File Handler (Persistence)
-        # Ensure log directory exists
-        log_dir = Path(settings.log_dir)
-        try:
-            log_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Daily rotation, keep 7 days
-            file_handler = TimedRotatingFileHandler(
-                filename=log_dir / "backend.log",
-                when="midnight",
-                interval=1,
-                backupCount=7,
-                encoding="utf-8"
-            )
-            # All logs persisted (INFO/DEBUG based on strictness, user said "all logs regardless of severity")
-            # But usually we don't want library debug logs in prod file unless specified.
-            # Requirement: "all logs (regardless of severity) must be persisted to files in production environment"
-            # This implies DEBUG level for file handler.
-            file_handler.setLevel(logging.DEBUG)
-            file_handler.setFormatter(JSONFormatter())
-            file_handler.addFilter(SensitiveDataFilter())
-            logger.addHandler(file_handler)
-            
-        except Exception as e:
-            # Fallback if file logging fails (e.g. permissions)
-            sys.stderr.write(f"Failed to setup file logging: {e}\n")
+        # 2. File Handler (Persistence), written by the directory's background listener
+        if settings.log_dir not in _file_queue_handlers:
+            _file_queue_handlers[settings.log_dir] = _start_file_listener(settings.log_dir)
+        queue_handler = _file_queue_handlers[settings.log_dir]
+        if queue_handler is not None:
+            handlers.append(queue_handler)
+
+        _handlers[key] = handlers
+        return handlers
+
+def get_logger(name: str) -> Logger:
+    cached = _cache.get(name)
+    if cached is not None:
+        return cached
+    
+    # Locked so two threads configuring the same logger can't both attach the handlers
+    with _cache_lock:
+        cached = _cache.get(name)
+        if cached is not None:
+            return cached
+
+        logger = logging.getLogger(name)
+        logger.setLevel(logging.DEBUG) # Capture all logs, handlers decide what to output
+        logger.propagate = False # Prevent double logging if attached to root
+
+        if not logger.handlers:
+            for handler in _shared_handlers():
+                logger.addHandler(handler)
 
-    _cache[name] = logger
-    return logger
\ No newline at end of file
+        _cache[name] = logger
+        return logger
\ No newline at end of file
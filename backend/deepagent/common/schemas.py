@@ -11,10 +11,13 @@ class ChatRequest(BaseModel):
     message: str
 
 
+TodoStatus = Literal["pending", "in_progress", "completed", "failed"]
+
+
 class TodoItem(BaseModel):
     id: str
     title: str
-    status: Literal["pending", "in_progress", "completed", "failed"] = "pending"
+    status: TodoStatus = "pending"
 
 
 class TodoWriteRequest(BaseModel):
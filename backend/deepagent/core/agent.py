@@ -2,21 +2,21 @@ from __future__ import annotations
 
 import asyncio
 import json
+import logging
 import os
 import random
+import re
+import threading
 import time
 import uuid
-from datetime import datetime
-from threading import get_ident
-from typing import Any, cast
+import weakref
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Iterable, cast
 
 import httpx
-from deepagents import create_deep_agent
-from deepagents.backends import FilesystemBackend
 from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_core.runnables import RunnableConfig
 
-from deepagent.common.config import get_settings, resolve_path
+from deepagent.common.config import Settings, get_settings, resolve_path
 from deepagent.common.logger import get_logger
 from deepagent.common.schemas import TodoItem
 from deepagent.core.prompts import AGENT_SYSTEM_PROMPT
@@ -28,9 +28,9 @@ from deepagent.core.memory import (
     store_search,
 )
 from deepagent.core.models import ModelRouter
-from deepagent.core.todos import TodoStore
+from deepagent.core.todos import TodoStore, todo_dict
 from deepagent.core.toolbox import ToolBox
-from deepagent.core.planner import Planner
+from deepagent.core.planner import PlanOutput, Planner, new_todo_id
 from deepagent.core.execution import ExecutionEngine
 from deepagent.core.observer import PlanObserver
 from deepagent.integrations.mcp_client import MCPRegistry
@@ -42,8 +42,58 @@ from deepagent.common.exceptions import (
     AgentStreamError
 )
 
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableConfig
+
 logger = get_logger("deepagent.core.agent")
 
+MAX_CACHED_FACTS = 512
+FACT_CACHE_TTL_SECONDS = 60.0
+# Caps on the memory block injected each turn, so one oversized item can't blow up the prompt
+MAX_FACT_CHARS = 800
+MAX_FACTS_TOTAL_CHARS = 6000
+SUMMARY_DEBOUNCE_SECONDS = 2.0
+RETRY_ATTEMPTS = 5
+RETRYABLE_STATUS_CODES = (429, 503)
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 20.0
+# Greetings and acknowledgements that never need a plan
+_TRIVIAL_MESSAGE = re.compile(
+    r"\s*(hi|hello|hey|thanks|thank you|thx|ok|okay|bye|goodbye|good (morning|afternoon|evening))"
+    r"[\s!.?]*",
+    re.IGNORECASE,
+)
+
+
+def _retry_delay(exc: httpx.HTTPStatusError, previous: float) -> tuple[float, float]:
+    """
+    Seconds to wait before retrying a 429/503, and the backoff state for the next attempt.
+    A numeric Retry-After header wins; otherwise use decorrelated jitter capped at RETRY_MAX_DELAY.
+    """
+    backoff = min(RETRY_MAX_DELAY, random.uniform(RETRY_BASE_DELAY, previous * 3))
+    retry_after = exc.response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(RETRY_MAX_DELAY, max(0.0, float(retry_after))), backoff
+        except ValueError:
+            # HTTP-date form; fall back to our own backoff
+            pass
+    return backoff, backoff
+
+
+class _SyncLoop:
+    """
+    Event loop for the sync wrappers of one thread, closed once the thread-local slot
+    holding it is dropped: when its thread exits or the agent is collected.
+    """
+
+    __slots__ = ("loop", "close", "__weakref__")
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.close = weakref.finalize(self, self.loop.close)
+
+
 class DeepAgent:
     def __init__(
         self,
@@ -51,27 +101,51 @@ class DeepAgent:
         todo_store: TodoStore | None = None,
         store=None,
         checkpointer=None,
+        mcp_registry: MCPRegistry | None = None,
+        skill_registry: SkillRegistry | None = None,
+        model_router: ModelRouter | None = None,
+        settings: Settings | None = None,
     ) -> None:
-        self.settings = get_settings()
+        self.settings = settings or get_settings()
         self.todo_store = todo_store or TodoStore()
         self.store = store or create_store()
         self.checkpointer = checkpointer
         
-        mcp_config_path = resolve_path(self.settings.mcp_config_path)
-        mcp_servers_dir = str(resolve_path(self.settings.mcp_servers_dir))
-        if mcp_config_path.exists():
-            self.mcp_registry = MCPRegistry.from_config(str(mcp_config_path), mcp_servers_dir)
+        # Subagents share their parent's registries and router instead of reloading config
+        if mcp_registry is not None:
+            self.mcp_registry = mcp_registry
         else:
-            self.mcp_registry = MCPRegistry.from_env(os.getenv("DEEPAGENT_MCP_SERVERS"))
+            mcp_config_path = resolve_path(self.settings.mcp_config_path)
+            mcp_servers_dir = str(resolve_path(self.settings.mcp_servers_dir))
+            if mcp_config_path.exists():
+                self.mcp_registry = MCPRegistry.from_config(str(mcp_config_path), mcp_servers_dir)
+            else:
+                self.mcp_registry = MCPRegistry.from_env(os.getenv("DEEPAGENT_MCP_SERVERS"))
         
-        self.skill_registry = SkillRegistry.from_env(os.getenv("DEEPAGENT_SKILLS"))
+        self.skill_registry = skill_registry or SkillRegistry.from_env(os.getenv("DEEPAGENT_SKILLS"))
         self.depth = depth
-        self._agent_cache: dict[tuple[str, int], Any] = {}
+        # Compiled agent graphs keyed by system prompt, least recently used first
+        self._agent_cache: OrderedDict[str, Any] = OrderedDict()
+        self._agent_cache_lock = threading.Lock()
+        # Event loop per thread for the sync invoke() wrapper
+        self._sync_loops = threading.local()
+        self._backend = None
+        self._subagent: DeepAgent | None = None
+        # (MCP registry version, rendered prompt)
+        self._system_prompt_cache: tuple[int, str] | None = None
+        # (user_id, message) -> (expires_at, relevant memories), least recently used first
+        self._fact_cache: OrderedDict[tuple[str, str], tuple[float, list[Any]]] = OrderedDict()
+        
+        # Summary checks queued for the background worker, when one is running
+        self._summary_queue: asyncio.Queue[tuple[str, str] | None] | None = None
+        self._summary_worker_task: asyncio.Task | None = None
         
         # Concurrency limit semaphore
         self._concurrency_semaphore = asyncio.Semaphore(self.settings.max_concurrency)
+        # Summaries are background work; keep them to a fraction of the concurrency budget
+        self._summary_semaphore = asyncio.Semaphore(max(1, self.settings.max_concurrency // 4))
 
-        self.model_router = ModelRouter.from_config(
+        self.model_router = model_router or ModelRouter.from_config(
             self.settings.model_config_path, self.settings
         )
         self.chat_model = self.model_router.get_model("chat")
@@ -81,67 +155,81 @@ class DeepAgent:
             memory_store=self.store,
             mcp_registry=self.mcp_registry,
             skill_registry=self.skill_registry,
-            subagent_fn=self._run_subagent,
+            subagent_fn=self._arun_subagent,
         )
         
         self.planner = Planner(self.model_router, self.toolbox)
         self.execution_engine = ExecutionEngine(self.todo_store, self.toolbox)
         self.observer = PlanObserver(self.model_router)
 
-    def _call_with_retry(self, fn):
-        delay = 1.0
-        for _ in range(3):
+    async def _acall_with_retry(self, coro_fn):
+        """Await an LLM call, backing off on rate limiting / overload without blocking the event loop."""
+        delay = RETRY_BASE_DELAY
+        for _ in range(RETRY_ATTEMPTS):
             try:
-                return fn()
+                return await coro_fn()
             except httpx.HTTPStatusError as exc:
-                if exc.response is None or exc.response.status_code != 429:
+                if exc.response is None or exc.response.status_code not in RETRYABLE_STATUS_CODES:
                     raise
-                time.sleep(delay + random.uniform(0, 0.3))
-                delay *= 2
+                wait, delay = _retry_delay(exc, delay)
+                await asyncio.sleep(wait)
         return None
 
-    def _summarize_text(self, turns: list[dict[str, str]]) -> str:
+    async def _summarize_text(self, turns: list[dict[str, str]], prior_summary: str = "") -> str:
         if not turns:
             return ""
-        lines = []
-        for turn in turns:
-            role = turn.get("role", "")
-            content = turn.get("content", "")
-            if content:
-                lines.append(f"{role}: {content}")
-        if not lines:
+        transcript = "\n".join(
+            f"{turn.get('role', '')}: {content}" for turn in turns if (content := turn.get("content"))
+        )
+        if not transcript:
             return ""
-        system = SystemMessage(
-            content=(
-                "Summarize the conversation for long-term memory. Keep key facts, goals,"
-                " preferences, decisions, and open questions. Be concise."
+        if prior_summary:
+            # Fold only the new turns into the running summary instead of resending the history
+            system = SystemMessage(
+                content=(
+                    "Update this running long-term memory summary with the new conversation turns."
+                    " Keep key facts, goals, preferences, decisions, and open questions;"
+                    " drop anything the new turns resolve or supersede. Be concise."
+                )
+            )
+            transcript = f"Current summary:\n{prior_summary}\n\nNew turns:\n{transcript}"
+        else:
+            system = SystemMessage(
+                content=(
+                    "Summarize the conversation for long-term memory. Keep key facts, goals,"
+                    " preferences, decisions, and open questions. Be concise."
+                )
             )
-        )
         summary_model = self.model_router.get_model("summary")
-        result = self._call_with_retry(
-            lambda: summary_model.invoke([system, HumanMessage(content="\n".join(lines))])
-        )
+        async with self._summary_semaphore:
+            result = await self._acall_with_retry(
+                lambda: summary_model.ainvoke([system, HumanMessage(content=transcript)])
+            )
         return str(result.content) if result else ""
 
-    def _maybe_store_summary(
-        self,
-        user_id: str,
-        thread_id: str,
-        items: list[dict[str, Any]],
-        conversations: list[dict[str, Any]],
-    ) -> None:
-        if len(conversations) < 8:
-            return
+    async def _maybe_store_summary(self, user_id: str, thread_id: str) -> None:
+        # Loaded here rather than per turn so the store scan runs off the request path
+        conversations: list[dict[str, Any]] = []
         last_summary_count = 0
-        for item in reversed(items):
+        prior_summary = ""
+        prior_summary_id = None
+        for item in await asyncio.to_thread(store_all, user_id):
             value = item.get("value") if isinstance(item, dict) else None
-            if isinstance(value, dict) and value.get("type") == "summary":
-                last_summary_count = int(value.get("conversation_count", 0))
-                break
-        if len(conversations) - last_summary_count < 8:
+            if not isinstance(value, dict):
+                continue
+            if value.get("type") == "conversation":
+                conversations.append(value)
+            elif value.get("type") == "summary":
+                # The store file is append-only, so conversations are in turn order and a
+                # summary's count is the index of the first turn it did not cover
+                count = int(value.get("conversation_count", 0))
+                if count >= last_summary_count:
+                    last_summary_count = count
+                    prior_summary = str(value.get("summary") or "")
+                    prior_summary_id = item.get("key")
+        chunk = conversations[min(last_summary_count, len(conversations)):]
+        if len(chunk) < self.settings.summary_batch_min:
             return
-        start = last_summary_count if last_summary_count >= 0 else 0
-        chunk = conversations[start:]
         turns: list[dict[str, str]] = []
         for value in chunk:
             um = value.get("user_message")
@@ -150,10 +238,11 @@ class DeepAgent:
                 turns.append({"role": "user", "content": um})
             if isinstance(ar, str) and ar:
                 turns.append({"role": "assistant", "content": ar})
-        summary = self._summarize_text(turns)
+        summary = await self._summarize_text(turns, prior_summary)
         if not summary:
             return
-        store_put(
+        await asyncio.to_thread(
+            store_put,
             self.store,
             user_id,
             {
@@ -161,126 +250,317 @@ class DeepAgent:
                 "thread_id": thread_id,
                 "conversation_count": len(conversations),
                 "summary": summary,
-                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "base_summary_id": prior_summary_id,
+                "timestamp": time.time(),
             },
         )
-    def _get_agent(self, thread_id: str):
-        cache_key = (thread_id, get_ident())
-        if cache_key in self._agent_cache:
-            return self._agent_cache[cache_key]
-        checkpointer = create_checkpointer(thread_id)
+
+    def start_summary_worker(self) -> None:
+        """Start the worker that coalesces summary checks; call from the serving event loop."""
+        if self._summary_worker_task is not None:
+            return
+        self._summary_queue = asyncio.Queue()
+        self._summary_worker_task = asyncio.create_task(self._summary_worker())
+
+    async def stop_summary_worker(self) -> None:
+        """Stop the worker after it has run every summary check still queued."""
+        task, queue = self._summary_worker_task, self._summary_queue
+        if task is None or queue is None:
+            return
+        # Turns recorded from here on run their check inline
+        self._summary_worker_task = None
+        self._summary_queue = None
+        queue.put_nowait(None)
+        await task
+
+    async def _summary_worker(self) -> None:
+        queue = self._summary_queue
+        assert queue is not None
+        while True:
+            key = await queue.get()
+            if key is None:
+                return
+            pending = {key}
+            # Let a burst of turns settle so they share one check (and at most one summary call)
+            await asyncio.sleep(SUMMARY_DEBOUNCE_SECONDS)
+            stopping = False
+            while not queue.empty():
+                key = queue.get_nowait()
+                if key is None:
+                    stopping = True
+                else:
+                    pending.add(key)
+            await self._run_summary_checks(pending)
+            if stopping:
+                return
+
+    async def _run_summary_checks(self, pending: set[tuple[str, str]]) -> None:
+        for user_id, thread_id in pending:
+            try:
+                await self._maybe_store_summary(user_id, thread_id)
+            except Exception as e:
+                logger.error("Summary check failed for user '%s': %s", user_id, e, exc_info=True)
+
+    async def _relevant_memories(self, user_id: str, message: str) -> list[Any]:
+        """
+        Store search for the per-turn memory context, cached briefly per (user, message).
+        Repeated or retried messages skip the search; a user's entries are dropped when
+        their turn is recorded, and other writes become visible once the TTL lapses.
+        """
+        key = (user_id, message)
+        now = time.monotonic()
+        cached = self._fact_cache.get(key)
+        if cached is not None and cached[0] > now:
+            self._fact_cache.move_to_end(key)
+            return cached[1]
         
-        # Configure recursion limit
-        agent = create_deep_agent(
-            model=self.chat_model,
-            tools=self.toolbox.tools(),
-            checkpointer=checkpointer,
-            store=self.store,
-            system_prompt=self._system_prompt(),
-            backend=FilesystemBackend(root_dir=str(resolve_path(self.settings.workspace_root))),
+        relevant = await asyncio.to_thread(store_search, self.store, user_id, query=message, limit=8)
+        self._fact_cache[key] = (now + FACT_CACHE_TTL_SECONDS, relevant)
+        self._fact_cache.move_to_end(key)
+        while len(self._fact_cache) > MAX_CACHED_FACTS:
+            self._fact_cache.popitem(last=False)
+        return relevant
+
+    def _invalidate_facts(self, user_id: str) -> None:
+        for key in [k for k in self._fact_cache if k[0] == user_id]:
+            del self._fact_cache[key]
+
+    async def _record_turn(
+        self,
+        thread_id: str,
+        user_id: str,
+        message: str,
+        reply: str,
+        background_tasks: Any = None,
+    ) -> None:
+        """Persist a completed turn and schedule the long-term summary check."""
+        await asyncio.to_thread(
+            store_put,
+            self.store,
+            user_id,
+            {
+                "type": "conversation",
+                "thread_id": thread_id,
+                "user_message": message,
+                "agent_reply": reply,
+                "timestamp": time.time(),
+            },
         )
-        # Note: LangGraph agents are compiled. If we could pass recursion_limit here we would.
-        # But usually it's passed at invoke time via config.
-        
-        self._agent_cache[cache_key] = agent
-        return agent
+        self._invalidate_facts(user_id)
+        if self._summary_queue is not None:
+            self._summary_queue.put_nowait((user_id, thread_id))
+        elif background_tasks is not None:
+            # Runs after the response has been sent
+            background_tasks.add_task(self._maybe_store_summary, user_id, thread_id)
+        else:
+            await self._maybe_store_summary(user_id, thread_id)
+
+    def _get_agent(self, thread_id: str):
+        """
+        Compiled agent graph shared by every conversation thread.
+        The thread only flows through the invoke config, so graphs are cached per system prompt
+        (which changes only when the MCP tool listing does). Callers needing persistence bind a
+        checkpointer with `agent.copy(update={"checkpointer": ...})`, which skips recompilation.
+        """
+        system_prompt = self._system_prompt()
+        # The sync invoke() wrapper may run on several threads; the lock also keeps two
+        # callers from compiling the same graph at once
+        with self._agent_cache_lock:
+            agent = self._agent_cache.get(system_prompt)
+            if agent is not None:
+                self._agent_cache.move_to_end(system_prompt)
+                return agent
+            
+            # deepagents is slow to import (~2s); defer it until the first agent is compiled
+            from deepagents import create_deep_agent
+
+            agent = create_deep_agent(
+                model=self.chat_model,
+                tools=self.toolbox.tools(),
+                store=self.store,
+                system_prompt=system_prompt,
+                backend=self._filesystem_backend(),
+            )
+            # Note: LangGraph agents are compiled. If we could pass recursion_limit here we would.
+            # But usually it's passed at invoke time via config.
+            
+            self._agent_cache[system_prompt] = agent
+            while len(self._agent_cache) > self.settings.max_cached_agents:
+                self._agent_cache.popitem(last=False)
+            return agent
+
+    def _filesystem_backend(self):
+        """Workspace backend for the agent's file tools, created once and reused by every compiled graph."""
+        if self._backend is None:
+            from deepagents.backends import FilesystemBackend
+
+            self._backend = FilesystemBackend(root_dir=str(resolve_path(self.settings.workspace_root)))
+        return self._backend
 
     def new_thread_id(self) -> str:
         return str(uuid.uuid4())
 
     def _system_prompt(self) -> str:
+        # The rendered prompt only changes when the MCP registry is (re)initialized
+        cached = self._system_prompt_cache
+        if cached is not None and cached[0] == self.mcp_registry.version:
+            return cached[1]
+
         # Dynamically list available tools
         mcp_tools_desc = ""
         try:
-            self.toolbox._ensure_mcp_initialized()
-            all_mcp_tools = []
-            for server_name in self.mcp_registry.servers:
-                # Note: list_tools is synchronous, no need for _run_async
-                # If we make it async later, we'd need _run_async
-                tools = self.mcp_registry.list_tools(server_name)
-                for t in tools:
-                     all_mcp_tools.append(f"- {t['name']} (Server: {server_name}): {t['description']}")
+            all_mcp_tools = self.toolbox.mcp_tool_lines()
             if all_mcp_tools:
                 mcp_tools_desc = "\nAvailable MCP Tools:\n" + "\n".join(all_mcp_tools)
         except Exception as e:
             logger.warn(f"Failed to list MCP tools for system prompt: {e}")
+            # Don't cache a prompt missing the tool listing; retry on the next turn
+            return AGENT_SYSTEM_PROMPT.format(tools_description=mcp_tools_desc)
 
-        return AGENT_SYSTEM_PROMPT.format(tools_description=mcp_tools_desc)
+        prompt = AGENT_SYSTEM_PROMPT.format(tools_description=mcp_tools_desc)
+        self._system_prompt_cache = (self.mcp_registry.version, prompt)
+        return prompt
 
-    def _run_subagent(self, task: str) -> str:
+    async def _arun_subagent(self, task: str) -> str:
         if self.depth >= 1:
             return "Subagent limit reached"
-        subagent = DeepAgent(
-            depth=self.depth + 1,
-            todo_store=self.todo_store,
-            store=self.store,
-            checkpointer=None,
-        )
+        # Subagents hold no per-task state (each task gets its own thread id), so one child
+        # is built lazily and reused; its compiled graph is then cached across spawns
+        subagent = self._subagent
+        if subagent is None:
+            subagent = self._subagent = DeepAgent(
+                depth=self.depth + 1,
+                todo_store=self.todo_store,
+                store=self.store,
+                checkpointer=None,
+                mcp_registry=self.mcp_registry,
+                skill_registry=self.skill_registry,
+                model_router=self.model_router,
+                settings=self.settings,
+            )
         sub_thread = f"sub-{uuid.uuid4().hex[:8]}"
         config = {"configurable": {"thread_id": sub_thread, "user_id": "subagent"}}
-        result = subagent._get_agent(sub_thread).invoke(
-            {"messages": [{"role": "user", "content": task}]},
-            config=config,
-        )
+        # Cap how many subagents run at once when the agent fans out tasks in parallel
+        async with self._concurrency_semaphore:
+            result = await subagent._get_agent(sub_thread).ainvoke(
+                {"messages": [{"role": "user", "content": task}]},
+                config=config,
+            )
         last = result["messages"][-1].content if result.get("messages") else ""
         return str(last)
 
     def plan(self, message: str):
         """Generate a plan based on the user's message."""
+        if _TRIVIAL_MESSAGE.fullmatch(message):
+            return PlanOutput(plan=[], todos=[], summary="")
         try:
-            logger.debug(f"Generating plan for message: {message}")
+            logger.debug("Generating plan for message: %s", message)
             result = self.planner.generate_plan(message)
-            logger.debug(f"Plan generation result: {result}")
-            
-            # Fallback: if todos are empty but plan exists, generate todos from plan
-            if result.plan and not result.todos:
-                logger.info("Todos missing from LLM output, generating from plan")
-                result.todos = [
-                    TodoItem(id=str(uuid.uuid4()), title=step, status="pending") 
-                    for step in result.plan
-                ]
-            return result
+            return self._complete_plan(result)
+        except Exception as e:
+            return self._failed_plan(e)
+
+    async def aplan(self, message: str):
+        """Async version of plan() that keeps the event loop free during the planner call and 429 backoff."""
+        if _TRIVIAL_MESSAGE.fullmatch(message):
+            # Skip the planner round-trip entirely
+            return PlanOutput(plan=[], todos=[], summary="")
+        try:
+            logger.debug("Generating plan for message: %s", message)
+            result = await self._acall_with_retry(lambda: self.planner.agenerate_plan(message))
+            if result is None:
+                raise PlanGenerationError("Planner was rate limited on every attempt")
+            return self._complete_plan(result)
         except Exception as e:
-            # Wrap generic exception
-            error_event = AgentErrorHandler.format_error(PlanGenerationError("Failed to generate plan", original_error=e))
-            # We can't yield here easily as this is a sync method returning PlanOutput
-            # But we can log it properly
-            logger.error(f"Plan generation failed: {e}", exc_info=True)
-            return type('PlanOutput', (), {'plan': [], 'todos': [], 'summary': ''})()
+            return self._failed_plan(e)
+
+    def _complete_plan(self, result: PlanOutput) -> PlanOutput:
+        logger.debug("Plan generation result: %s", result)
+        
+        # Fallback: if todos are empty but plan exists, generate todos from plan
+        if result.plan and not result.todos:
+            logger.info("Todos missing from LLM output, generating from plan")
+            result.todos = [
+                # Fields are known-good here, so skip validation
+                TodoItem.model_construct(id=new_todo_id(), title=str(step), status="pending")
+                for step in result.plan
+            ]
+        return result
+
+    def _failed_plan(self, e: Exception) -> PlanOutput:
+        # Wrap generic exception
+        error_event = AgentErrorHandler.format_error(PlanGenerationError("Failed to generate plan", original_error=e))
+        # We can't yield here easily as this is a method returning PlanOutput
+        # But we can log it properly
+        logger.error(f"Plan generation failed: {e}", exc_info=True)
+        return PlanOutput(plan=[], todos=[], summary="")
+
+    def _sync_loop(self) -> asyncio.AbstractEventLoop:
+        # Reuse one loop per calling thread instead of creating and tearing one down per call
+        # (asyncio.Runner would do this, but needs Python 3.11)
+        holder = getattr(self._sync_loops, "holder", None)
+        if holder is None or holder.loop.is_closed():
+            holder = self._sync_loops.holder = _SyncLoop()
+        return holder.loop
+
+    def close_sync_loop(self) -> None:
+        """Close the calling thread's loop used by the sync wrappers, if it has one."""
+        holder = getattr(self._sync_loops, "holder", None)
+        if holder is not None:
+            del self._sync_loops.holder
+            holder.close()
 
     def invoke(self, thread_id: str, user_id: str, message: str, background_tasks: Any = None):
+        """Sync wrapper around ainvoke for callers without a running event loop."""
+        return self._sync_loop().run_until_complete(
+            self.ainvoke(thread_id, user_id, message, background_tasks)
+        )
+
+    def invoke_many(
+        self, thread_id: str, user_id: str, messages: Iterable[str], background_tasks: Any = None
+    ) -> list[dict[str, Any]]:
+        """Sync wrapper that runs several turns of one thread in order within a single loop entry."""
+        return self._sync_loop().run_until_complete(
+            self.ainvoke_many(thread_id, user_id, messages, background_tasks)
+        )
+
+    async def ainvoke_many(
+        self, thread_id: str, user_id: str, messages: Iterable[str], background_tasks: Any = None
+    ) -> list[dict[str, Any]]:
+        """Run turns of one thread back to back; each sees the checkpointed history of the last."""
+        return [
+            await self.ainvoke(thread_id, user_id, message, background_tasks)
+            for message in messages
+        ]
+
+    async def ainvoke(self, thread_id: str, user_id: str, message: str, background_tasks: Any = None):
         """Non-streaming version of invoke_stream that returns the full result."""
-        import asyncio
-        
-        async def collect_events():
-            events = []
-            async for event in self.invoke_stream(thread_id, user_id, message, background_tasks):
-                events.append(event)
-            return events
-        
-        events = asyncio.run(collect_events())
-        
-        # Process events to extract the final result
-        reply = ""
+        reply_parts: list[str] = []
         plan = []
         summary = ""
         todos = []
+        # Looked up before the turn: invoke_stream's own lookup then hits the fact cache,
+        # so the store is searched once per request
+        relevant = await self._relevant_memories(user_id, message)
         
-        for event in events:
+        async for event in self.invoke_stream(thread_id, user_id, message, background_tasks):
             if event.get("type") == "token":
-                reply += event.get("content", "")
+                reply_parts.append(event.get("content", ""))
             elif event.get("type") == "plan":
                 plan = event.get("plan", [])
                 summary = event.get("summary", "")
             elif event.get("type") == "todos":
                 todos = event.get("todos", [])
+            elif event.get("type") == "todo_update":
+                todos = [
+                    {**t, "status": event["status"]} if t.get("id") == event.get("id") else t
+                    for t in todos
+                ]
         
-        # Get relevant memories
-        relevant = store_search(self.store, user_id, query=message, limit=8)
-        memories = [str(m.value) for m in relevant]
+        memories = [m.value for m in relevant]
         
         return {
-            "reply": reply,
+            "reply": "".join(reply_parts),
             "plan": plan,
             "summary": summary,
             "todos": todos,
@@ -294,15 +574,20 @@ class DeepAgent:
             # 1. Generate Plan
             yield {"type": "status", "content": "Analyzing request..."}
             try:
-                plan = self.plan(message)
-                logger.info(f"Generated Plan:\n{plan.plan}\nTodos:\n{[t.title for t in plan.todos]}")
+                # The memory lookup doesn't depend on the plan; overlap it with the planner call
+                plan, relevant = await asyncio.gather(
+                    self.aplan(message), self._relevant_memories(user_id, message)
+                )
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("Generated Plan:\n%s\nTodos:\n%s", plan.plan, [t.title for t in plan.todos])
             except Exception as e:
                  raise PlanGenerationError("Plan generation step failed", original_error=e)
             
             # 2. Analyze Plan with Observer
-            if plan:
+            observer_feedback = None
+            if plan.plan or plan.todos:
                 yield {"type": "status", "content": "Analyzing plan..."}
-                observer_feedback = self.observer.update(
+                observer_feedback = await self.observer.aupdate(
                     type="plan",
                     plan=plan.plan,
                     todos=plan.todos
@@ -310,26 +595,26 @@ class DeepAgent:
                 
                 if observer_feedback:
                     yield {"type": "observer_feedback", "feedback": observer_feedback["feedback"]}
-                    logger.info(f"Observer feedback on plan: {observer_feedback['feedback'][:100]}...")
+                    logger.info("Observer feedback on plan: %.100s...", observer_feedback["feedback"])
             
             # NOTE: We need to pass the plan/todos to the agent executor so it knows what to do!
             # The agent uses the system prompt and conversation history.
             # We must inject the generated plan into the conversation context or system prompt for this run.
             
-            plan_context = ""
+            plan_parts: list[str] = []
             if plan:
                 yield {"type": "plan", "plan": plan.plan, "summary": plan.summary}
                 if plan.todos:
                     self.todo_store.write(thread_id, plan.todos)
-                    yield {"type": "todos", "todos": [t.model_dump() for t in plan.todos]}
+                    yield {"type": "todos", "todos": [todo_dict(t) for t in plan.todos]}
                     
                     # Format plan for the agent
-                    plan_text = "\n".join([f"- {t.title} (ID: {t.id})" for t in plan.todos])
-                    plan_context = f"\n\nCURRENT PLAN:\n{plan_text}\n\nExecute the plan step-by-step using available tools. Update the todo status as you proceed. IF A TOOL IS AVAILABLE TO SOLVE THE TASK, YOU MUST USE IT. IMPORTANT: After each step, you MUST use the 'write_todos' tool to mark the corresponding task as 'completed'."
+                    plan_text = "\n".join(f"- {t.title} (ID: {t.id})" for t in plan.todos)
+                    plan_parts.append(f"CURRENT PLAN:\n{plan_text}\n\nExecute the plan step-by-step using available tools. Update the todo status as you proceed. IF A TOOL IS AVAILABLE TO SOLVE THE TASK, YOU MUST USE IT. IMPORTANT: After each step, you MUST use the 'write_todos' tool to mark the corresponding task as 'completed'.")
                     
                     # Add observer feedback to plan context if available
                     if observer_feedback:
-                        plan_context += f"\n\nOBSERVER FEEDBACK:\n{observer_feedback['feedback']}"
+                        plan_parts.append(f"OBSERVER FEEDBACK:\n{observer_feedback['feedback']}")
             
             # 2. Prepare Context
             config: RunnableConfig = {
@@ -337,25 +622,31 @@ class DeepAgent:
                 "recursion_limit": self.settings.recursion_limit
             }
             
-            # Load history and facts
-            items = store_all(user_id)
-            relevant = store_search(self.store, user_id, query=message, limit=8)
-            facts = [str(m.value) for m in relevant]
+            # The budget is spent in search rank order, so the lowest-ranked memories are dropped
+            kept: list[tuple[str, str]] = []
+            seen: set[str] = set()
+            budget = MAX_FACTS_TOTAL_CHARS
+            for m in relevant:
+                fact = str(m.value)[:min(MAX_FACT_CHARS, budget)]
+                if not fact:
+                    break
+                # The same turn is often stored more than once (e.g. via memory_put); send it once
+                if fact in seen:
+                    continue
+                seen.add(fact)
+                kept.append((m.key, fact))
+                budget -= len(fact)
+            # The kept facts are then sorted by key so the same set always renders byte-identically
+            facts = [fact for _, fact in sorted(kept)]
             
             messages = []
-            # Inject plan context into the system message for THIS turn
-            system_content = self._system_prompt()
+            # The static system prompt is compiled into the shared agent graph, so the provider
+            # prompt prefix (system prompt + checkpointed history) stays stable across turns.
+            # Per-turn context goes after it, least volatile first: memory, then this turn's plan.
             if facts:
-                system_content += "\n\nRelevant memory:\n" + "\n".join(facts)
-            
-            if plan_context:
-                system_content += plan_context
-                
-            # We can't easily replace the system prompt of the compiled graph dynamically without rebuilding it
-            # OR we can pass it as a SystemMessage at the start of the conversation window for this turn.
-            # LangGraph usually appends messages.
-            
-            messages.append({"role": "system", "content": system_content})
+                messages.append({"role": "system", "content": "Relevant memory:\n" + "\n".join(facts)})
+            if plan_parts:
+                messages.append({"role": "system", "content": "\n\n".join(plan_parts)})
             messages.append({"role": "user", "content": message})
             
             yield {"type": "status", "content": "Thinking..."}
@@ -363,29 +654,36 @@ class DeepAgent:
             # 3. Stream Execution
             # AsyncSqliteSaver.from_conn_string returns an async context manager
             async with create_checkpointer(thread_id) as checkpointer:
-                 # Create agent with the specific system prompt for this turn (including plan)
-                 # Note: create_deep_agent takes 'system_prompt'. 
-                 # If we want dynamic system prompts per turn in LangGraph, passing it as a message is often better 
-                 # than rebuilding the graph, BUT create_deep_agent likely fixes the system prompt node.
-                 # Let's rebuild it to be safe and simple.
-                 
-                agent_executor = create_deep_agent(
-                    model=self.chat_model,
-                    tools=self.toolbox.tools(),
-                    checkpointer=checkpointer,
-                    store=self.store,
-                    system_prompt=system_content, # Pass the dynamic prompt here
-                    backend=FilesystemBackend(root_dir=str(resolve_path(self.settings.workspace_root))),
-                )
+                # Reuse the compiled graph; only the per-thread checkpointer is bound for this turn
+                agent_executor = self._get_agent(thread_id).copy(update={"checkpointer": checkpointer})
 
-                accumulated_reply = ""
+                # Token chunks are collected and joined once, avoiding repeated string concatenation
+                reply_parts: list[str] = []
                 current_task = None
+                # Observer reviews of finished tasks run in the background so they don't hold up
+                # the token stream; their feedback is emitted as soon as each review completes
+                pending_reviews: list[tuple[asyncio.Task, str]] = []
+
+                async def review_events(wait: bool = False):
+                    if wait and pending_reviews:
+                        await asyncio.wait([review for review, _ in pending_reviews])
+                    for item in [item for item in pending_reviews if item[0].done()]:
+                        pending_reviews.remove(item)
+                        review, task_title = item
+                        observer_feedback = review.result()
+                        if observer_feedback:
+                            yield {"type": "observer_feedback", "feedback": observer_feedback["feedback"]}
+                            logger.info(
+                                "Observer feedback on task '%s': %.100s...",
+                                task_title, observer_feedback["feedback"],
+                            )
+
                 try:
                     async for event in self.execution_engine.execute_plan(
                         thread_id, agent_executor, messages, config
                     ):
                         if event.get("type") == "token":
-                            accumulated_reply += event.get("content", "")
+                            reply_parts.append(event.get("content", ""))
                         
                         # Track current task
                         if event.get("type") == "tool_start" and event.get("tool") != "write_todos":
@@ -403,29 +701,39 @@ class DeepAgent:
                                 remaining_tasks = [t for t in current_todos if t.status != "completed"]
                                 
                                 # Analyze task result with observer
-                                observer_feedback = self.observer.update(
-                                    type="task_result",
-                                    task=current_task,
-                                    result=tool_output,
-                                    remaining_tasks=remaining_tasks
+                                review = asyncio.create_task(
+                                    self.observer.aupdate(
+                                        type="task_result",
+                                        task=current_task,
+                                        result=tool_output,
+                                        remaining_tasks=remaining_tasks,
+                                    )
                                 )
-                                
-                                if observer_feedback:
-                                    yield {"type": "observer_feedback", "feedback": observer_feedback["feedback"]}
-                                    logger.info(f"Observer feedback on task '{current_task.title}': {observer_feedback['feedback'][:100]}...")
-                                    
-                                    # Update plan context with observer feedback for next steps
-                                    if plan_context:
-                                        plan_context += f"\n\nOBSERVER FEEDBACK ON '{current_task.title}':\n{observer_feedback['feedback']}"
+                                pending_reviews.append((review, current_task.title))
                         
                         yield event
+                        
+                        if pending_reviews:
+                            async for review_event in review_events():
+                                yield review_event
+                    
+                    async for review_event in review_events(wait=True):
+                        yield review_event
                 except Exception as e:
                     # Capture stream errors
                     raise AgentStreamError("Error during agent execution stream", original_error=e)
+                finally:
+                    for review, _ in pending_reviews:
+                        review.cancel()
                 
                 # Log the final reply
+                accumulated_reply = "".join(reply_parts)
                 if accumulated_reply:
-                    logger.info(f"Final Agent Reply:\n{accumulated_reply}")
+                    logger.info("Final Agent Reply:\n%s", accumulated_reply)
+
+            # 4. Finalize: save the turn and summarize off the response path
+            if accumulated_reply:
+                await self._record_turn(thread_id, user_id, message, accumulated_reply, background_tasks)
 
         except Exception as e:
             # Global error handler for the stream
@@ -440,29 +748,10 @@ class DeepAgent:
                 
                 if updated:
                     self.todo_store.write(thread_id, current_todos)
-                    yield {"type": "todos", "todos": [t.model_dump() for t in current_todos]}
+                    yield {"type": "todos", "todos": [todo_dict(t) for t in current_todos]}
                     logger.warn("Marked all pending tasks as failed due to critical exception.")
             except Exception as cleanup_error:
                 logger.error(f"Failed to cleanup todos during error handling: {cleanup_error}")
 
             error_response = AgentErrorHandler.format_error(e)
             yield error_response
-
-
-        # 4. Finalize (Store memory, etc.)
-        # Ideally we'd capture the final state here. 
-        # Since astream_events yields granular events, we might need to 
-        # reconstruct the final reply or rely on the client to assemble tokens.
-        
-        # For memory storage, we might need to invoke a separate non-streaming save
-        # or capture the full reply from the aggregated tokens.
-        
-        # For this PoC, we assume the client handles the aggregation.
-        # But we DO need to save the turn. 
-        # We can't easily get the *full* final reply from astream_events without accumulating.
-        # So let's accumulate tokens.
-        
-        # (Accumulation logic would go inside the loop above)
-        
-        # Trigger background summary if needed
-        # if background_tasks: ...
\ No newline at end of file
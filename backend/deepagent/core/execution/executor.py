@@ -1,11 +1,17 @@
+import heapq
 import re
-from typing import AsyncGenerator, Dict, Any, List
+from collections import deque
+from typing import AsyncGenerator, Deque, Dict, Any, List, Tuple
 
 from deepagent.core.memory import create_checkpointer
-from deepagent.core.todos import TodoStore
+from deepagent.core.todos import TodoStore, todo_dict
 from deepagent.core.toolbox import ToolBox
 from deepagent.common.schemas import TodoItem
 
+# Explicit failure markers in tool output, checked in a single pass
+_FAILURE_RE = re.compile(r'"success":\s*false|"isError"\s*:\s*true|Rate limited')
+_IS_ERROR_FALSE_RE = re.compile(r'"isError"\s*:\s*false')
+
 class ExecutionEngine:
     def __init__(self, todo_store: TodoStore, toolbox: ToolBox):
         self.todo_store = todo_store
@@ -19,12 +25,15 @@ class ExecutionEngine:
         config: Dict[str, Any]
     ) -> AsyncGenerator[Dict[str, Any], None]:
         """Execute the plan using LangGraph and yield events."""
-        accumulated_reply = ""
+        # Working copy of the thread's todos for this turn, with index queues so each tool
+        # event is O(1)/O(log n); the store is only written when a status actually changes
+        todos = self.todo_store.get(thread_id)
+        pending, in_progress = self._index_todos(todos)
         
         async for event in agent_executor.astream_events(
             {"messages": messages}, 
             config=config, 
-            version="v1"
+            version="v2"
         ):
             kind = event["event"]
             
@@ -32,84 +41,109 @@ class ExecutionEngine:
                 content = event["data"]["chunk"].content
                 if content:
                     yield {"type": "token", "content": content}
-                    accumulated_reply += content
             
             elif kind == "on_tool_start":
                 tool_name = event["name"]
                 tool_input = event["data"].get("input")
                 
-                yield {"type": "tool_start", "tool": tool_name, "input": tool_input}
-                yield {"type": "status", "content": f"Running {tool_name}..."}
+                yield {
+                    "type": "tool_start",
+                    "tool": tool_name,
+                    "input": tool_input,
+                    "status": f"Running {tool_name}...",
+                }
                 
                 # Auto-update logic: Find the first 'pending' todo and mark it 'in_progress'
                 if tool_name != "write_todos":
-                    current_todos = self.todo_store.get(thread_id)
-                    first_pending = next((t for t in current_todos if t.status == "pending"), None)
-                    if first_pending:
-                        first_pending.status = "in_progress"
-                        self.todo_store.write(thread_id, current_todos)
-                        yield {"type": "todos", "todos": [t.model_dump() for t in current_todos]}
+                    while pending:
+                        index = pending.popleft()
+                        if todos[index].status == "pending":
+                            todos[index].status = "in_progress"
+                            heapq.heappush(in_progress, index)
+                            self.todo_store.write(thread_id, todos)
+                            yield self._todo_delta(todos[index])
+                            break
             
             elif kind == "on_tool_end":
                 tool_output = event["data"].get("output")
                 tool_name = event["name"]
                 
-                yield {"type": "tool_end", "tool": tool_name, "output": str(tool_output)}
-                yield {"type": "status", "content": f"Finished {tool_name}"}
+                yield {
+                    "type": "tool_end",
+                    "tool": tool_name,
+                    "output": str(tool_output),
+                    "status": f"Finished {tool_name}",
+                }
                 
                 # Check for failure in tool output
                 is_failed = self._is_tool_failed(tool_output)
                 
                 # If tool was write_todos, refresh the client's todo list
                 if tool_name == "write_todos":
-                     current_todos = self.todo_store.get(thread_id)
-                     yield {"type": "todos", "todos": [t.model_dump() for t in current_todos]}
+                     todos = self.todo_store.get(thread_id)
+                     pending, in_progress = self._index_todos(todos)
+                     yield {"type": "todos", "todos": [todo_dict(t) for t in todos]}
                 else:
-                     # Auto-update logic
-                     current_todos = self.todo_store.get(thread_id)
-                     in_progress_task = next((t for t in current_todos if t.status == "in_progress"), None)
-                     
-                     if in_progress_task:
+                     # Auto-update logic: settle the earliest in_progress todo
+                     while in_progress:
+                         index = heapq.heappop(in_progress)
+                         in_progress_task = todos[index]
+                         if in_progress_task.status != "in_progress":
+                             continue
                          if is_failed:
                              in_progress_task.status = "failed"
                          else:
                              # If success, auto-complete it
                              in_progress_task.status = "completed"
                           
-                         self.todo_store.write(thread_id, current_todos)
-                         yield {"type": "todos", "todos": [t.model_dump() for t in current_todos]}
+                         self.todo_store.write(thread_id, todos)
+                         yield self._todo_delta(in_progress_task)
+                         break
         
         # Finalize & Auto-complete in_progress tasks
-        final_todos = self.todo_store.get(thread_id)
-        updated = False
-        for t in final_todos:
-            if t.status == "in_progress":
-                t.status = "completed"
-                updated = True
+        completed = []
+        for index in sorted(in_progress):
+            if todos[index].status == "in_progress":
+                todos[index].status = "completed"
+                completed.append(todos[index])
         
-        if updated:
-            self.todo_store.write(thread_id, final_todos)
-            yield {"type": "todos", "todos": [t.model_dump() for t in final_todos]}
+        if completed:
+            self.todo_store.write(thread_id, todos)
+            for t in completed:
+                yield self._todo_delta(t)
+
+    @staticmethod
+    def _index_todos(todos: List[TodoItem]) -> Tuple[Deque[int], List[int]]:
+        """Indices of pending todos (plan order) and a min-heap of in_progress todo indices."""
+        pending: Deque[int] = deque()
+        in_progress: List[int] = []
+        for i, t in enumerate(todos):
+            if t.status == "pending":
+                pending.append(i)
+            elif t.status == "in_progress":
+                # Appended in ascending order, so this is already a valid heap
+                in_progress.append(i)
+        return pending, in_progress
+
+    @staticmethod
+    def _todo_delta(todo: TodoItem) -> Dict[str, Any]:
+        """Single-todo status change event; full 'todos' snapshots are only sent when the list itself changes."""
+        return {"type": "todo_update", "id": todo.id, "status": todo.status}
     
     def _is_tool_failed(self, tool_output: Any) -> bool:
         """Check if a tool execution failed."""
-        is_failed = False
-        output_str = str(tool_output)
-        
-        try:
-            if '"success": false' in output_str:
-                is_failed = True
-            elif "Rate limited" in output_str:
-                is_failed = True
-            # Check for "isError": true (with flexible spacing)
-            elif re.search(r'"isError"\s*:\s*true', output_str):
-                is_failed = True
-            # Only flag "Error" if it's not part of "isError": false
-            elif "Error" in output_str and '"isError": false' not in output_str and '"isError":false' not in output_str:
-                if "Traceback" in output_str or "Exception" in output_str:
-                    is_failed = True
-        except Exception:
-            if '"success": false' in output_str or "Rate limited" in output_str:
-                is_failed = True
-        
-        return is_failed
\ No newline at end of file
+        # ToolMessage from a tool that raised
+        if getattr(tool_output, "status", None) == "error":
+            return True
+        content = getattr(tool_output, "content", tool_output)
+        if isinstance(content, dict):
+            return content.get("success") is False or content.get("isError") is True
+        output_str = content if isinstance(content, str) else str(content)
+        if _FAILURE_RE.search(output_str):
+            return True
+        # Only flag "Error" if it's not part of "isError": false
+        return (
+            "Error" in output_str
+            and ("Traceback" in output_str or "Exception" in output_str)
+            and not _IS_ERROR_FALSE_RE.search(output_str)
+        )
@@ -1,17 +1,31 @@
 from __future__ import annotations
 
-import json
-import json
+import atexit
+import math
+import os
+import re
+import sys
+import threading
 import uuid
-from typing import Any
+import weakref
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator
 
+import aiosqlite
+import orjson
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.store.base import PutOp
 from langgraph.store.memory import InMemoryStore
 
 from deepagent.common.config import get_settings, resolve_path
+from deepagent.common.filelock import file_lock
 
 
-def create_checkpointer(thread_id: str):
+@asynccontextmanager
+async def create_checkpointer(thread_id: str) -> AsyncIterator[AsyncSqliteSaver]:
     settings = get_settings()
     base = resolve_path(settings.memory_db_path)
     base.parent.mkdir(parents=True, exist_ok=True)
@@ -19,7 +33,11 @@ def create_checkpointer(thread_id: str):
     db_path.parent.mkdir(parents=True, exist_ok=True)
     # Use str() to ensure native path separators (backslashes on Windows)
     # and avoid URI parsing issues.
-    return AsyncSqliteSaver.from_conn_string(str(db_path))
+    async with aiosqlite.connect(str(db_path)) as conn:
+        # The saver's setup() puts the file in WAL mode, where synchronous=NORMAL stays
+        # crash-safe but drops the fsync on every checkpoint commit
+        await conn.executescript("PRAGMA synchronous=NORMAL; PRAGMA temp_store=MEMORY;")
+        yield AsyncSqliteSaver(conn)
 
 
 def _store_file_path():
@@ -27,26 +45,144 @@ def _store_file_path():
     path = resolve_path(settings.memory_store_path)
     path.parent.mkdir(parents=True, exist_ok=True)
     if not path.exists():
-        path.write_text(json.dumps({}), encoding="utf-8")
+        path.write_bytes(b"{}")
     return path
 
 
-def _load_store(store: InMemoryStore) -> None:
+# The JSON snapshot is loaded once into memory; new items are appended to a JSONL journal
+# beside it and folded back into the snapshot every JOURNAL_COMPACT_ITEMS writes and at exit.
+# Several worker processes may share the files: every access holds an exclusive lock on
+# "<store>.lock", first catches up on journal lines other processes appended, and reloads
+# everything when another process has compacted (replaced the snapshot).
+JOURNAL_COMPACT_ITEMS = 256
+
+_cache_lock = threading.RLock()
+_lock_depth = 0
+_cache: dict[str, list[dict[str, Any]]] | None = None
+_cache_path: Path | None = None
+# (inode, mtime_ns, size) of the snapshot the cache was loaded from
+_snapshot: tuple[int, int, int] | None = None
+# Bytes of the journal already applied to the cache, and how many items they hold
+_journal_offset = 0
+_journal_items = 0
+
+
+def _journal_path(path: Path) -> Path:
+    return path.with_name(path.name + "l")
+
+
+def _snapshot_key(path: Path) -> tuple[int, int, int]:
+    st = path.stat()
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+@contextmanager
+def _store_lock() -> Iterator[None]:
+    """_cache_lock plus, outermost only, the store's lock shared with other processes."""
+    global _lock_depth
+    with _cache_lock:
+        if _lock_depth:
+            yield
+            return
+        path = _store_file_path()
+        with file_lock(path.with_name(path.name + ".lock")):
+            _lock_depth = 1
+            try:
+                yield
+            finally:
+                _lock_depth = 0
+
+
+def _replay_journal(journal: Path, offset: int, raw: dict[str, list[dict[str, Any]]]) -> tuple[int, int]:
+    """Apply the journal's complete lines from offset onwards; returns (new offset, items applied)."""
+    try:
+        with journal.open("rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return offset, 0
+    end = data.rfind(b"\n") + 1
+    if end < len(data):
+        # Appends happen under the lock we hold, so an unterminated tail is a write torn by a
+        # crash; drop it so the next append starts on a fresh line
+        os.truncate(journal, offset + end)
+    applied = 0
+    for line in data[:end].splitlines():
+        if not line:
+            continue
+        entry = orjson.loads(line)
+        raw.setdefault(entry["user_id"], []).append({"key": entry["key"], "value": entry["value"]})
+        applied += 1
+    return offset + end, applied
+
+
+def _cached_store() -> dict[str, list[dict[str, Any]]]:
+    """The whole store as {user_id: [{"key", "value"}, ...]}; callers must hold _store_lock()."""
+    global _cache, _cache_path, _snapshot, _journal_offset, _journal_items
     path = _store_file_path()
-    raw = json.loads(path.read_text(encoding="utf-8") or "{}")
-    for user_id, items in raw.items():
-        namespace = ns_for_user(user_id)
-        for item in items:
-            store.put(namespace, item["key"], item["value"])
+    journal = _journal_path(path)
+    snapshot = _snapshot_key(path)
+    if _cache is not None and path == _cache_path and snapshot == _snapshot:
+        _journal_offset, applied = _replay_journal(journal, _journal_offset, _cache)
+        _journal_items += applied
+        return _cache
+    raw = orjson.loads(path.read_bytes() or b"{}")
+    offset, applied = _replay_journal(journal, 0, raw)
+    _cache, _cache_path, _snapshot = raw, path, snapshot
+    _journal_offset, _journal_items = offset, applied
+    return raw
+
+
+def _compact() -> None:
+    """Write the cached store back to the JSON snapshot and empty the journal."""
+    global _snapshot, _journal_offset, _journal_items
+    if _cache is None:
+        return
+    with _store_lock():
+        # Catch up first so items journaled by other processes reach the snapshot
+        raw = _cached_store()
+        if not _journal_items or _cache_path is None:
+            return
+        tmp = _cache_path.with_name(_cache_path.name + ".tmp")
+        tmp.write_bytes(orjson.dumps(raw, option=orjson.OPT_INDENT_2))
+        os.replace(tmp, _cache_path)
+        _journal_path(_cache_path).write_bytes(b"")
+        _snapshot = _snapshot_key(_cache_path)
+        _journal_offset = _journal_items = 0
+
+
+atexit.register(_compact)
+
+
+def _load_store(store: InMemoryStore) -> None:
+    with _store_lock():
+        # One batch for every saved memory instead of a store round-trip per item
+        ops = [
+            PutOp(ns_for_user(user_id), item["key"], item["value"])
+            for user_id, items in _cached_store().items()
+            for item in items
+        ]
+    if ops:
+        store.batch(ops)
 
 
 def _persist_item(user_id: str, key: str, value: dict[str, Any]) -> None:
-    path = _store_file_path()
-    raw = json.loads(path.read_text(encoding="utf-8") or "{}")
-    items = raw.get(user_id, [])
-    items.append({"key": key, "value": value})
-    raw[user_id] = items
-    path.write_text(json.dumps(raw, indent=2), encoding="utf-8")
+    global _journal_offset, _journal_items
+    with _store_lock():
+        raw = _cached_store()
+        raw.setdefault(user_id, []).append({"key": key, "value": value})
+        line = orjson.dumps({"user_id": user_id, "key": key, "value": value}) + b"\n"
+        with _journal_path(_cache_path).open("ab") as journal:
+            journal.write(line)
+        _journal_offset += len(line)
+        _journal_items += 1
+        if _journal_items >= JOURNAL_COMPACT_ITEMS:
+            _compact()
+
+
+def format_timestamp(ts: float) -> str:
+    """Render a stored epoch timestamp as an ISO-8601 UTC string."""
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat().replace("+00:00", "Z")
 
 
 def create_store() -> InMemoryStore:
@@ -66,20 +202,110 @@ def store_put(store: InMemoryStore, user_id: str, value: dict[str, Any]) -> str:
     return mem_id
 
 
+# Okapi BM25 parameters for keyword ranking in store_search
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _memory_text(value: Any) -> str:
+    """All string leaves of a stored memory value, joined for keyword indexing."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return " ".join(_memory_text(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return " ".join(_memory_text(v) for v in value)
+    return ""
+
+
+class _KeywordIndex:
+    """BM25 statistics over one user's memories, in store order, extended as new items appear."""
+
+    def __init__(self) -> None:
+        self.term_counts: list[Counter] = []
+        self.lengths: list[int] = []
+        self.doc_freq: Counter = Counter()
+        self.total_length = 0
+
+    def extend(self, items) -> None:
+        for item in items:
+            counts = Counter(_tokenize(_memory_text(item.value)))
+            self.term_counts.append(counts)
+            self.lengths.append(sum(counts.values()))
+            self.total_length += self.lengths[-1]
+            self.doc_freq.update(counts.keys())
+
+    def scores(self, terms: list[str]) -> list[float]:
+        n = len(self.term_counts)
+        avg_length = self.total_length / n if n else 0.0
+        idf = {
+            term: math.log(1 + (n - self.doc_freq[term] + 0.5) / (self.doc_freq[term] + 0.5))
+            for term in set(terms)
+            if term in self.doc_freq
+        }
+        scores = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length) if avg_length else BM25_K1
+            score = 0.0
+            for term, weight in idf.items():
+                tf = counts.get(term)
+                if tf:
+                    score += weight * tf * (BM25_K1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+
+# store -> user_id -> index; memories are only ever appended, so an index only needs extending
+_keyword_indexes: "weakref.WeakKeyDictionary[InMemoryStore, dict[str, _KeywordIndex]]" = (
+    weakref.WeakKeyDictionary()
+)
+_keyword_lock = threading.Lock()
+
+
 def store_search(store: InMemoryStore, user_id: str, query: str | None = None, limit: int = 5):
-    return store.search(ns_for_user(user_id), query=query, limit=limit)
+    """
+    Search a user's memories. The store has no vector index, so a query is matched by
+    BM25 keyword score; memories that don't match keep their store order after those that do.
+    """
+    terms = _tokenize(query) if query else []
+    if not terms:
+        return store.search(ns_for_user(user_id), limit=limit)
+    
+    namespace = ns_for_user(user_id)
+    items = store.search(namespace, limit=sys.maxsize)
+    with _keyword_lock:
+        index = _keyword_indexes.setdefault(store, {}).setdefault(user_id, _KeywordIndex())
+        if len(index.term_counts) > len(items):
+            index = _keyword_indexes[store][user_id] = _KeywordIndex()
+        index.extend(items[len(index.term_counts):])
+        scores = index.scores(terms)
+    ranked = sorted(range(len(items)), key=lambda i: -scores[i])[:limit]
+    return [items[i] for i in ranked]
 
 
 def store_recent(user_id: str, limit: int = 5) -> list[dict[str, Any]]:
-    path = _store_file_path()
-    raw = json.loads(path.read_text(encoding="utf-8") or "{}")
-    items = raw.get(user_id, [])
     if limit <= 0:
         return []
-    return items[-limit:]
+    with _store_lock():
+        return _cached_store().get(user_id, [])[-limit:]
 
 
 def store_all(user_id: str) -> list[dict[str, Any]]:
-    path = _store_file_path()
-    raw = json.loads(path.read_text(encoding="utf-8") or "{}")
-    return raw.get(user_id, [])
+    with _store_lock():
+        return list(_cached_store().get(user_id, []))
+
+
+def store_iter_type(user_id: str, type_name: str) -> Iterator[dict[str, Any]]:
+    """Yield a user's stored items whose value has the given "type", oldest first."""
+    with _store_lock():
+        items = list(_cached_store().get(user_id, []))
+    for item in items:
+        value = item.get("value")
+        if isinstance(value, dict) and value.get("type") == type_name:
+            yield item
@@ -1,19 +1,41 @@
 from __future__ import annotations
 
 import os
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
 from typing import Any
 
 import yaml
-# from langchain_community.chat_models import ChatZhipuAI # Removed in favor of ChatOpenAI
-from langchain_openai import ChatOpenAI
 from pydantic import SecretStr
 
 from deepagent.common.config import Settings, resolve_path
 from deepagent.common.logger import get_logger
 
+# libyaml's C parser when PyYAML was built with it; the pure-Python parser otherwise
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
-@dataclass
+_MISS = object()
+
+
+@lru_cache(maxsize=8)
+def _load_yaml(path: Path, mtime_ns: int, size: int) -> Any:
+    # Keyed on mtime and size so an edited config file is parsed again, even when it is
+    # rewritten within the filesystem's timestamp granularity
+    # Whole file in one read; the loader detects the UTF-8/16 encoding of bytes itself
+    return yaml.load(path.read_bytes(), Loader=_YAML_LOADER)
+
+
+def _as_dict(value: Any) -> dict:
+    return value if isinstance(value, dict) else {}
+
+
+def _secret(api_key: str | None) -> SecretStr | None:
+    return SecretStr(api_key) if api_key else None
+
+
+@dataclass(frozen=True, slots=True)
 class ModelSpec:
     provider: str
     model: str
@@ -22,13 +44,20 @@ class ModelSpec:
     base_url: str | None = None
     max_retries: int = 3
     request_timeout: float = 60.0
+    # Resolved by ModelRouter when it is built, so creating a model needs no adapter lookup
+    # or env read; a router built after settings are reloaded picks up new keys
+    _adapter: ModelAdapter | None = field(default=None, init=False, repr=False, compare=False)
+    _api_key: SecretStr | None = field(default=None, init=False, repr=False, compare=False)
 
 class ModelAdapter:
+    def api_key(self, spec: ModelSpec, settings: Settings) -> SecretStr | None:
+        raise NotImplementedError
+
     def create(self, spec: ModelSpec, settings: Settings):
         raise NotImplementedError
 
 class ZhipuAdapter(ModelAdapter):
-    def create(self, spec: ModelSpec, settings: Settings):
+    def api_key(self, spec: ModelSpec, settings: Settings) -> SecretStr | None:
         api_key = (
             settings.zhipu_api_key
             if not spec.api_key_env
@@ -37,8 +66,13 @@ class ZhipuAdapter(ModelAdapter):
         if not api_key:
              # Try to get from ZHIPUAI_API_KEY env var directly as fallback
              api_key = os.getenv("ZHIPUAI_API_KEY")
-        
-        api_key_secret = SecretStr(api_key) if api_key else None
+        return _secret(api_key)
+
+    def create(self, spec: ModelSpec, settings: Settings):
+        # Imported on first use: langchain_openai pulls in a large dependency tree
+        from langchain_openai import ChatOpenAI
+
+        api_key_secret = spec._api_key or self.api_key(spec, settings)
         
         # Use ChatOpenAI with Zhipu's OpenAI-compatible endpoint
         base_url = spec.base_url or settings.zhipu_base_url
@@ -53,9 +87,14 @@ class ZhipuAdapter(ModelAdapter):
         )
 
 class OpenAIAdapter(ModelAdapter):
+    def api_key(self, spec: ModelSpec, settings: Settings) -> SecretStr | None:
+        return _secret(os.getenv(spec.api_key_env or "OPENAI_API_KEY"))
+
     def create(self, spec: ModelSpec, settings: Settings):
-        api_key = os.getenv(spec.api_key_env or "OPENAI_API_KEY")
-        api_key_secret = SecretStr(api_key) if api_key else None
+        # Imported on first use: langchain_openai pulls in a large dependency tree
+        from langchain_openai import ChatOpenAI
+
+        api_key_secret = spec._api_key or self.api_key(spec, settings)
         
         # Use provider-specific base URL if not specified in spec
         base_url = spec.base_url
@@ -73,30 +112,43 @@ class OpenAIAdapter(ModelAdapter):
         )
 
 
+# Adapters hold no state, so every router shares these instances
+_OPENAI_ADAPTER = OpenAIAdapter()
+_ADAPTERS: dict[str, ModelAdapter] = {
+    "zhipu": ZhipuAdapter(),
+    "openai": _OPENAI_ADAPTER,
+    "doubao": _OPENAI_ADAPTER,
+    "nvidia": _OPENAI_ADAPTER,
+}
+
+
 class ModelRouter:
     def __init__(self, specs: dict[str, ModelSpec], defaults: ModelSpec, settings: Settings):
         self.specs = specs
         self.defaults = defaults
         self.settings = settings
-        self.adapters: dict[str, ModelAdapter] = {
-            "zhipu": ZhipuAdapter(),
-            "openai": OpenAIAdapter(),
-            "doubao": OpenAIAdapter(),
-            "nvidia": OpenAIAdapter(),
-        }
+        self.adapters: dict[str, ModelAdapter] = dict(_ADAPTERS)
         self._cache: dict[str, Any] = {}
+        # Guards model creation only; cache hits are read without the lock
+        self._cache_lock = threading.Lock()
+        for spec in (defaults, *specs.values()):
+            adapter = self.adapters.get(spec.provider)
+            # Specs are frozen; these cache-only fields are set once here, before the spec is shared
+            object.__setattr__(spec, "_adapter", adapter)
+            object.__setattr__(spec, "_api_key", adapter.api_key(spec, settings) if adapter else None)
 
     @classmethod
     def from_config(cls, path: str, settings: Settings) -> "ModelRouter":
         full_path = resolve_path(path)
-        data = yaml.safe_load(full_path.read_text(encoding="utf-8")) or {}
+        stat = full_path.stat()
+        data = _as_dict(_load_yaml(full_path, stat.st_mtime_ns, stat.st_size))
         
         # Get the provider from settings (environment variable)
         provider = settings.model_provider
         
         # Get provider-specific configuration
-        providers_config = data.get("providers", {}) if isinstance(data, dict) else {}
-        provider_config = providers_config.get(provider, {}) if isinstance(providers_config, dict) else {}
+        providers_config = _as_dict(data.get("providers"))
+        provider_config = _as_dict(providers_config.get(provider))
         
         # Create default spec from provider config
         default_spec = ModelSpec(
@@ -111,9 +163,10 @@ class ModelRouter:
         
         specs: dict[str, ModelSpec] = {}
         # Get provider-specific models config
-        provider_models = provider_config.get("models", {}) if isinstance(provider_config, dict) else {}
+        provider_models = _as_dict(provider_config.get("models"))
         for name, raw in provider_models.items():
-            if not isinstance(raw, dict):
+            raw = _as_dict(raw)
+            if not raw:
                 continue
             specs[name] = ModelSpec(
                 provider=provider,
@@ -128,10 +181,20 @@ class ModelRouter:
         return cls(specs=specs, defaults=default_spec, settings=settings)
 
     def get_model(self, step: str):
-        if step in self._cache:
-            return self._cache[step]
+        model = self._cache.get(step, _MISS)
+        if model is not _MISS:
+            return model
+        with self._cache_lock:
+            model = self._cache.get(step, _MISS)
+            if model is not _MISS:
+                return model
+            model = self._create_model(step)
+            self._cache[step] = model
+            return model
+
+    def _create_model(self, step: str):
         spec = self.specs.get(step, self.defaults)
-        adapter = self.adapters.get(spec.provider)
+        adapter = spec._adapter
         if not adapter:
             logger = get_logger("deepagent.models")
             logger.warn(
@@ -139,9 +202,7 @@ class ModelRouter:
                 f"falling back to defaults provider '{self.defaults.provider}'"
             )
             spec = self.defaults
-            adapter = self.adapters.get(spec.provider)
+            adapter = spec._adapter
             if not adapter:
                 raise ValueError(f"No adapter available for default provider: {spec.provider}")
-        model = adapter.create(spec, self.settings)
-        self._cache[step] = model
-        return model
\ No newline at end of file
+        return adapter.create(spec, self.settings)
\ No newline at end of file
@@ -1,3 +1,4 @@
+import asyncio
 from typing import List, Dict, Any, Optional
 from abc import ABC, abstractmethod
 
@@ -15,12 +16,19 @@ class Observer(ABC):
         """Update the observer with new information."""
         pass
 
+    async def aupdate(self, *args, **kwargs) -> Optional[Dict[str, Any]]:
+        """Async version of update; runs the sync update in a worker thread by default."""
+        return await asyncio.to_thread(self.update, *args, **kwargs)
+
 class PlanObserver(Observer):
     """Observer that monitors plans and task results, providing suggestions."""
     
     def __init__(self, model_router: ModelRouter):
         self.model_router = model_router
         self.chat_model = self.model_router.get_model("chat")
+        # The system prompts never change, so build their messages once
+        self._plan_system = SystemMessage(content=OBSERVER_PLAN_ANALYSIS_PROMPT)
+        self._task_system = SystemMessage(content=OBSERVER_TASK_ANALYSIS_PROMPT)
     
     def update(self, *args, **kwargs) -> Optional[Dict[str, Any]]:
         """Update the observer with new information."""
@@ -35,43 +43,75 @@ class PlanObserver(Observer):
                 kwargs.get("remaining_tasks")
             )
         return None
+
+    async def aupdate(self, *args, **kwargs) -> Optional[Dict[str, Any]]:
+        """Async version of update that awaits the chat model, so several analyses can overlap."""
+        update_type = kwargs.get("type")
+        
+        if update_type == "plan":
+            return await self._aanalyze_plan(kwargs.get("plan"), kwargs.get("todos"))
+        elif update_type == "task_result":
+            return await self._aanalyze_task_result(
+                kwargs.get("task"), 
+                kwargs.get("result"), 
+                kwargs.get("remaining_tasks")
+            )
+        return None
     
     def _analyze_plan(self, plan: List[str], todos: List[TodoItem]) -> Dict[str, Any]:
         """Analyze the plan and provide suggestions for improvement."""
-        system = SystemMessage(content=OBSERVER_PLAN_ANALYSIS_PROMPT)
-        
+        response = self.chat_model.invoke(self._plan_messages(plan, todos))
+        return self._plan_feedback(response.content, plan, todos)
+
+    async def _aanalyze_plan(self, plan: List[str], todos: List[TodoItem]) -> Dict[str, Any]:
+        response = await self.chat_model.ainvoke(self._plan_messages(plan, todos))
+        return self._plan_feedback(response.content, plan, todos)
+    
+    def _analyze_task_result(self, task: TodoItem, result: str, remaining_tasks: List[TodoItem]) -> Dict[str, Any]:
+        """Analyze a task result and provide suggestions for adjusting the plan."""
+        response = self.chat_model.invoke(self._task_messages(task, result, remaining_tasks))
+        return self._task_feedback(response.content, task, result, remaining_tasks)
+
+    async def _aanalyze_task_result(
+        self, task: TodoItem, result: str, remaining_tasks: List[TodoItem]
+    ) -> Dict[str, Any]:
+        response = await self.chat_model.ainvoke(self._task_messages(task, result, remaining_tasks))
+        return self._task_feedback(response.content, task, result, remaining_tasks)
+
+    def _plan_messages(self, plan: List[str], todos: List[TodoItem]) -> list:
         plan_text = "\n".join([f"- {step}" for step in plan])
         todos_text = "\n".join([f"- {todo.title} (status: {todo.status})" for todo in todos])
         
         message = HumanMessage(
             content=f"Plan:\n{plan_text}\n\nTodos:\n{todos_text}\n\nPlease analyze this plan and provide suggestions for improvement."
         )
+        return [self._plan_system, message]
+
+    def _task_messages(self, task: TodoItem, result: str, remaining_tasks: List[TodoItem]) -> list:
+        remaining_text = "\n".join([f"- {todo.title} (status: {todo.status})" for todo in remaining_tasks])
         
-        response = self.chat_model.invoke([system, message])
-        
+        message = HumanMessage(
+            content=f"Completed Task:\n{task.title}\n\nTask Result:\n{result}\n\nRemaining Tasks:\n{remaining_text}\n\nPlease analyze this task result and provide suggestions for adjusting the plan."
+        )
+        return [self._task_system, message]
+
+    @staticmethod
+    def _plan_feedback(feedback: Any, plan: List[str], todos: List[TodoItem]) -> Dict[str, Any]:
         return {
             "type": "plan_feedback",
-            "feedback": response.content,
+            "feedback": feedback,
             "plan": plan,
             "todos": todos
         }
-    
-    def _analyze_task_result(self, task: TodoItem, result: str, remaining_tasks: List[TodoItem]) -> Dict[str, Any]:
-        """Analyze a task result and provide suggestions for adjusting the plan."""
-        system = SystemMessage(content=OBSERVER_TASK_ANALYSIS_PROMPT)
-        
-        remaining_text = "\n".join([f"- {todo.title} (status: {todo.status})" for todo in remaining_tasks])
-        
-        message = HumanMessage(
-            content=f"Completed Task:\n{task.title}\n\nTask Result:\n{result}\n\nRemaining Tasks:\n{remaining_text}\n\nPlease analyze this task result and provide suggestions for adjusting the plan."
-        )
-        
-        response = self.chat_model.invoke([system, message])
-        
+
+    @staticmethod
+    def _task_feedback(
+        feedback: Any, task: TodoItem, result: str, remaining_tasks: List[TodoItem]
+    ) -> Dict[str, Any]:
         return {
             "type": "task_feedback",
             "task": task,
             "result": result,
-            "feedback": response.content,
+            "feedback": feedback,
             "remaining_tasks": remaining_tasks
-        }
\ No newline at end of file
+        }
@@ -1,3 +1,3 @@
-from .planner import Planner
+from .planner import PlanOutput, Planner, new_todo_id
 
-__all__ = ["Planner"]
\ No newline at end of file
+__all__ = ["PlanOutput", "Planner", "new_todo_id"]
@@ -1,11 +1,11 @@
 from typing import List, Optional
-import re
+import itertools
 import uuid
 
 from langchain_core.messages import HumanMessage, SystemMessage
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError, field_validator
 
-from deepagent.common.schemas import TodoItem
+from deepagent.common.schemas import TodoItem, TodoStatus
 from deepagent.core.planner.prompts import PLANNER_SYSTEM_PROMPT
 from deepagent.core.models import ModelRouter
 from deepagent.core.toolbox import ToolBox
@@ -13,6 +13,14 @@ from deepagent.common.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Todo IDs only need to be unique, not random: one uuid4 per process plus a counter
+_TODO_ID_PREFIX = uuid.uuid4().hex[:12]
+_todo_id_counter = itertools.count(1)
+
+
+def new_todo_id() -> str:
+    return f"{_TODO_ID_PREFIX}-{next(_todo_id_counter)}"
+
 def clean_json_response(response: str) -> str:
     """
     Clean up JSON response by removing code blocks, extra text, and ensuring valid JSON format.
@@ -23,22 +31,51 @@ def clean_json_response(response: str) -> str:
     Returns:
         Cleaned JSON string
     """
-    # Remove markdown code blocks
-    json_match = re.search(r'```json\n(.*?)\n```', response, re.DOTALL)
-    if json_match:
-        response = json_match.group(1)
-    
-    # Remove any backticks around JSON
-    response = response.strip().strip('`')
+    # Cut a ```json fenced block down to its body
+    if '```' in response:
+        fence_idx = response.find('```json')
+        if fence_idx != -1:
+            response = response[fence_idx + 7:]
+        close_idx = response.rfind('```')
+        if close_idx != -1:
+            response = response[:close_idx]
     
     # Remove any text before or after the JSON object
     # Look for the first '{' and last '}'
     start_idx = response.find('{')
     end_idx = response.rfind('}')
-    if start_idx != -1 and end_idx != -1:
-        response = response[start_idx:end_idx+1]
+    if start_idx != -1 and end_idx > start_idx:
+        return response[start_idx:end_idx+1]
     
-    return response
+    # Remove any backticks around JSON
+    return response.strip().strip('`')
+
+def _normalize_plan(plan) -> List[str]:
+    """Coerce the model's "plan" field to a list of steps."""
+    # Checked by exact type first: a list is by far the common case
+    if type(plan) is list:
+        return plan
+    if plan is None:
+        return []
+    if isinstance(plan, str):
+        return [plan] if plan else []
+    return [str(plan)]
+
+class _PlanTodo(BaseModel):
+    id: Optional[str] = None
+    title: str = ""
+    status: TodoStatus = "pending"
+
+class _PlanModel(BaseModel):
+    """Shape of the planner's JSON reply, validated straight from the response text."""
+    plan: List[str] = []
+    todos: List[_PlanTodo] = []
+    summary: str = ""
+
+    @field_validator("plan", mode="before")
+    @classmethod
+    def _coerce_plan(cls, value):
+        return _normalize_plan(value)
 
 class PlanOutput:
     def __init__(self, plan: List[str], todos: List[TodoItem], summary: str):
@@ -51,75 +88,83 @@ class Planner:
         self.model_router = model_router
         self.toolbox = toolbox
         self.planner_model = self.model_router.get_model("plan")
+        # (MCP registry version, rendered system message)
+        self._system_message_cache: Optional[tuple] = None
         
     def generate_plan(self, message: str) -> PlanOutput:
         """Generate a plan based on the user's message."""
-        import json
+        # Use raw text output instead of structured output to have more control over parsing
+        result = self.planner_model.invoke(self._build_messages(message))
+        return self._parse_plan(result.content)
+
+    async def agenerate_plan(self, message: str) -> PlanOutput:
+        """Async version of generate_plan that awaits the planner model."""
+        result = await self.planner_model.ainvoke(self._build_messages(message))
+        return self._parse_plan(result.content)
+
+    def _build_messages(self, message: str) -> list:
+        return [self._system_message(), HumanMessage(content=message)]
+
+    def _system_message(self) -> SystemMessage:
+        # The tool listing only changes when the MCP registry is (re)initialized
+        cached = self._system_message_cache
+        if cached is not None and cached[0] == self.toolbox.mcp_registry.version:
+            return cached[1]
         
         mcp_tools_desc = self._get_mcp_tools_description()
-        
         system = SystemMessage(
-            content=PLANNER_SYSTEM_PROMPT.format(tools_description=mcp_tools_desc)
+            content=PLANNER_SYSTEM_PROMPT.format(tools_description=mcp_tools_desc or "")
         )
-        
-        # Use raw text output instead of structured output to have more control over parsing
-        result = self.planner_model.invoke([system, HumanMessage(content=message)])
-        
+        if mcp_tools_desc is not None:
+            # Don't cache a prompt missing the tool listing; retry on the next plan
+            self._system_message_cache = (self.toolbox.mcp_registry.version, system)
+        return system
+
+    def _parse_plan(self, content: str) -> PlanOutput:
+        """Parse the raw planner response into a PlanOutput."""
         # Clean the response to remove code blocks and ensure valid JSON
-        cleaned_response = clean_json_response(result.content)
+        cleaned_response = clean_json_response(content)
         
         try:
-            # Parse the cleaned JSON
-            parsed_data = json.loads(cleaned_response)
-            
-            # Extract plan, todos, and summary
-            plan = parsed_data.get("plan", [])
-            todos_data = parsed_data.get("todos", [])
-            summary = parsed_data.get("summary", "")
-            
-            # Convert todos data to TodoItem objects
-            from deepagent.common.schemas import TodoItem
-            todos = []
-            for todo_data in todos_data:
-                # Ensure each todo has required fields
-                todo_id = todo_data.get("id", str(uuid.uuid4()))
-                title = todo_data.get("title", "")
-                status = todo_data.get("status", "pending")
-                todos.append(TodoItem(id=todo_id, title=title, status=status))
-            
-            return PlanOutput(
-                plan=plan,
-                todos=todos,
-                summary=summary
-            )
-        except json.JSONDecodeError as e:
+            # Parse and validate the cleaned JSON in one pass
+            parsed = _PlanModel.model_validate_json(cleaned_response)
+        except ValidationError as e:
             # If parsing fails, log the error and return an empty plan
             logger.error(f"Failed to parse plan JSON: {e}")
-            logger.error(f"Raw response: {result.content}")
+            logger.error(f"Raw response: {content}")
             logger.error(f"Cleaned response: {cleaned_response}")
             return PlanOutput(
                 plan=[],
                 todos=[],
                 summary=""
             )
+        
+        # Fields were validated by _PlanTodo, so skip revalidating them in TodoItem
+        todos = [
+            TodoItem.model_construct(
+                id=todo.id if todo.id is not None else new_todo_id(),
+                title=todo.title,
+                status=todo.status,
+            )
+            for todo in parsed.todos
+        ]
+        return PlanOutput(
+            plan=parsed.plan,
+            todos=todos,
+            summary=parsed.summary
+        )
     
-    def _get_mcp_tools_description(self) -> str:
-        """Get a description of available MCP tools."""
+    def _get_mcp_tools_description(self) -> Optional[str]:
+        """Get a description of available MCP tools, or None if they could not be listed."""
         mcp_tools_desc = ""
         try:
             # Debug: Print available servers
-            logger.debug(f"Available MCP servers: {list(self.toolbox.mcp_registry.servers.keys())}")
+            logger.debug("Available MCP servers: %s", list(self.toolbox.mcp_registry.servers))
             
-            self.toolbox._ensure_mcp_initialized()
-            all_mcp_tools = []
-            for server_name in self.toolbox.mcp_registry.servers:
-                tools = self.toolbox.mcp_registry.list_tools(server_name)
-                logger.debug(f"Tools for {server_name}: {[t['name'] for t in tools]}")
-                for t in tools:
-                     all_mcp_tools.append(f"- {t['name']} (Server: {server_name}): {t['description']}")
+            all_mcp_tools = self.toolbox.mcp_tool_lines()
             if all_mcp_tools:
                 mcp_tools_desc = "\nAvailable Tools for Execution:\n" + "\n".join(all_mcp_tools)
-                logger.debug(f"Generated tools description: {mcp_tools_desc}")
+                logger.debug("Generated tools description: %s", mcp_tools_desc)
             else:
                 logger.debug("No MCP tools found")
                 mcp_tools_desc = "\nNo tools are available for execution. Do not create plan steps that require tools."
@@ -127,4 +172,5 @@ class Planner:
             logger.error(f"Failed to get MCP tools description: {e}")
             import traceback
             logger.error(traceback.format_exc())
+            return None
         return mcp_tools_desc
\ No newline at end of file
@@ -1,34 +1,54 @@
 from __future__ import annotations
 
-import json
 from typing import Dict, List
 
+import orjson
+from pydantic import TypeAdapter
+
 from deepagent.common.config import resolve_path
 from deepagent.common.schemas import TodoItem
 
+# Validates a whole list in one call instead of one TodoItem(**item) per entry
+_TODO_LIST_ADAPTER = TypeAdapter(List[TodoItem])
+
+
+def todo_dict(item: TodoItem) -> dict:
+    """Plain-dict form of a todo; cheaper than `model_dump()` for this tiny, flat model."""
+    return {"id": item.id, "title": item.title, "status": item.status}
+
 
 class TodoStore:
     def __init__(self, file_path: str = "./data/todos.json") -> None:
         self.file_path = resolve_path(file_path)
         self.file_path.parent.mkdir(parents=True, exist_ok=True)
         if not self.file_path.exists():
-            self.file_path.write_text(json.dumps({}), encoding="utf-8")
-
-    def _load(self) -> Dict[str, List[TodoItem]]:
-        raw = json.loads(self.file_path.read_text(encoding="utf-8") or "{}")
-        return {
-            thread_id: [TodoItem(**item) for item in items] for thread_id, items in raw.items()
-        }
-
-    def _save(self, data: Dict[str, List[TodoItem]]) -> None:
-        serialized = {k: [item.model_dump() for item in v] for k, v in data.items()}
-        self.file_path.write_text(json.dumps(serialized, indent=2), encoding="utf-8")
+            self.file_path.write_bytes(b"{}")
+        # Parsed file contents, reused while the file's (mtime_ns, size) is unchanged
+        self._cache: Dict[str, List[dict]] | None = None
+        self._cache_key: tuple[int, int] | None = None
+
+    def _load_raw(self) -> Dict[str, List[dict]]:
+        st = self.file_path.stat()
+        key = (st.st_mtime_ns, st.st_size)
+        if self._cache is not None and key == self._cache_key:
+            return self._cache
+        self._cache = orjson.loads(self.file_path.read_bytes() or b"{}")
+        self._cache_key = key
+        return self._cache
+
+    def _save(self, data: Dict[str, List[dict]]) -> None:
+        # Compact output: the whole file is rewritten on every write
+        self.file_path.write_bytes(orjson.dumps(data))
+        st = self.file_path.stat()
+        self._cache = data
+        self._cache_key = (st.st_mtime_ns, st.st_size)
 
     def get(self, thread_id: str) -> List[TodoItem]:
-        return self._load().get(thread_id, [])
+        return _TODO_LIST_ADAPTER.validate_python(self._load_raw().get(thread_id, []))
 
     def write(self, thread_id: str, items: List[TodoItem]) -> List[TodoItem]:
-        data = self._load()
-        data[thread_id] = items
+        # Other threads' entries are written back as loaded, without revalidating them
+        data = self._load_raw()
+        data[thread_id] = [todo_dict(item) for item in items]
         self._save(data)
         return items
@@ -1,24 +1,42 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import concurrent.futures
+import importlib.util
+import itertools
 import os
 import subprocess
 import threading
+import weakref
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
 import httpx
+import orjson
 import yaml
 
+# libyaml's C parser when PyYAML was built with it; the pure-Python parser otherwise
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
-@dataclass
+# Keep-alive pool shared by every HTTP tool call so connections are reused across calls
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64)
+
+# Concurrent calls to an HTTPS server that negotiates HTTP/2 share one connection; httpx only
+# speaks it with the h2 package installed, and servers that don't offer it get HTTP/1.1
+_HTTP2 = importlib.util.find_spec("h2") is not None
+
+# How long a stdio request waits for the response carrying its id
+STDIO_REQUEST_TIMEOUT = 60.0
+
+
+@dataclass(frozen=True, slots=True)
 class MCPServerTool:
     name: str
     description: str = ""
 
 
-@dataclass
+@dataclass(slots=True)
 class MCPServer:
     name: str
     type: str = "http"
@@ -30,8 +48,13 @@ class MCPServer:
     enabled: bool = True
     tools: list[MCPServerTool] = field(default_factory=list)
     _process: Any = None
+    # Serializes writes to stdin; responses are routed back by id, so reads need no lock
     _lock: Any = None
-    _request_id: int = 0
+    # JSON-RPC request ids; next() on a count is atomic, so ids are taken outside _lock
+    _ids: Any = field(default_factory=lambda: itertools.count(1), repr=False)
+    # Request id -> Future resolved by the reader thread when the matching response arrives
+    _pending: dict = field(default_factory=dict, repr=False)
+    _closed: bool = False
 
 
 @dataclass
@@ -45,8 +68,7 @@ class MCPConfig:
         if not config_path.exists():
             return cls()
         
-        with open(config_path, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f) or {}
+        data = yaml.load(config_path.read_bytes(), Loader=_YAML_LOADER) or {}
         
         servers = []
         servers_dir = mcp_servers_dir or os.getenv("DEEPAGENT_MCP_SERVERS_DIR", "")
@@ -93,12 +115,20 @@ class MCPRegistry:
         self.servers = {s.name: s for s in (servers or [])}
         self._initialized = False
         self._init_lock = threading.Lock()
+        # Bumped whenever the set of available tools may have changed
+        self.version = 0
+        self._http: httpx.Client | None = None
+        self._http_lock = threading.Lock()
+        # AsyncClient connections belong to the loop that opened them, so keep one client per loop
+        self._async_http: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = (
+            weakref.WeakKeyDictionary()
+        )
 
     @classmethod
     def from_env(cls, raw: str | None) -> "MCPRegistry":
         if not raw:
             return cls([])
-        data = json.loads(raw)
+        data = orjson.loads(raw)
         servers = [MCPServer(**item) for item in data]
         return cls(servers)
 
@@ -108,6 +138,9 @@ class MCPRegistry:
         return cls([s for s in config.servers if s.enabled])
 
     def initialize(self) -> None:
+        # Read before locking: once set the flag never clears, so tool calls skip the lock
+        if self._initialized:
+            return
         with self._init_lock:
             if self._initialized:
                 return
@@ -117,6 +150,7 @@ class MCPRegistry:
                     self._start_stdio_server(server)
             
             self._initialized = True
+            self.version += 1
 
     def _start_stdio_server(self, server: MCPServer) -> None:
         if not server.command:
@@ -144,16 +178,21 @@ class MCPRegistry:
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             cwd=cwd,
-            text=True,
-            bufsize=1,
+            # Binary, block-buffered pipes: frames are JSON bytes, so skip the text-mode decoder
+            bufsize=-1,
         )
+        server._pending.clear()
+        server._closed = False
+        threading.Thread(
+            target=self._read_responses, args=(server,), name=f"mcp-{server.name}-reader", daemon=True
+        ).start()
         
         self._send_mcp_initialize(server)
 
     def _send_mcp_initialize(self, server: MCPServer) -> None:
         init_request = {
             "jsonrpc": "2.0",
-            "id": 1,
+            "id": next(server._ids),
             "method": "initialize",
             "params": {
                 "protocolVersion": "2024-11-05",
@@ -161,28 +200,57 @@ class MCPRegistry:
                 "clientInfo": {"name": "deepagent", "version": "1.0.0"}
             }
         }
-        response = self._send_and_receive(server, init_request)
+        response = self._request(server, init_request)
         
         initialized_notification = {
             "jsonrpc": "2.0",
             "method": "notifications/initialized"
         }
-        self._send_message(server, initialized_notification)
+        with server._lock:
+            self._send_message(server, initialized_notification)
 
     def _send_message(self, server: MCPServer, message: dict) -> None:
         if not server._process or not server._process.stdin:
             raise RuntimeError(f"Server {server.name} not initialized")
-        msg_str = json.dumps(message) + "\n"
-        server._process.stdin.write(msg_str)
+        server._process.stdin.write(orjson.dumps(message) + b"\n")
         server._process.stdin.flush()
 
-    def _send_and_receive(self, server: MCPServer, message: dict) -> dict:
-        with server._lock:
-            self._send_message(server, message)
-            line = server._process.stdout.readline()
-            if not line:
-                raise RuntimeError(f"Server {server.name} closed connection")
-            return json.loads(line.strip())
+    def _request(self, server: MCPServer, message: dict) -> dict:
+        """Send one JSON-RPC request and wait for its response; concurrent requests overlap."""
+        request_id = message["id"]
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        server._pending[request_id] = future
+        # Checked after registering: either the reader's final sweep sees this future or we see the flag
+        if server._closed:
+            server._pending.pop(request_id, None)
+            raise RuntimeError(f"Server {server.name} closed connection")
+        try:
+            with server._lock:
+                self._send_message(server, message)
+            return future.result(timeout=STDIO_REQUEST_TIMEOUT)
+        finally:
+            server._pending.pop(request_id, None)
+
+    def _read_responses(self, server: MCPServer) -> None:
+        """Reader thread: hand each response to the future waiting on its id."""
+        stdout = server._process.stdout
+        for line in iter(stdout.readline, b""):
+            try:
+                message = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                # Not a JSON-RPC frame (e.g. stray output from the server); skip it
+                continue
+            if not isinstance(message, dict) or "method" in message:
+                # Server-initiated requests and notifications aren't handled
+                continue
+            future = server._pending.pop(message.get("id"), None)
+            if future is not None:
+                future.set_result(message)
+        server._closed = True
+        for request_id in list(server._pending):
+            future = server._pending.pop(request_id, None)
+            if future is not None:
+                future.set_exception(RuntimeError(f"Server {server.name} closed connection"))
 
     def call(self, server_name: str, payload: dict[str, Any]) -> dict[str, Any]:
         self.initialize()
@@ -196,37 +264,64 @@ class MCPRegistry:
         else:
             return self._call_http_sync(server, payload)
 
+    async def acall(self, server_name: str, payload: dict[str, Any]) -> dict[str, Any]:
+        """Async version of call: HTTP servers are awaited directly, stdio pipes are read in a worker thread."""
+        if not self._initialized:
+            await asyncio.to_thread(self.initialize)
+        
+        server = self.servers.get(server_name)
+        if not server:
+            raise ValueError(f"MCP server not found: {server_name}")
+        
+        if server.type == "stdio":
+            return await asyncio.to_thread(self._call_stdio, server, payload)
+        res = await self._async_http_client().post(server.endpoint, json=payload)
+        res.raise_for_status()
+        return res.json()
+
+    async def alist_tools(self, server_name: str) -> list[dict]:
+        return await asyncio.to_thread(self.list_tools, server_name)
+
+    def _async_http_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_http.get(loop)
+        if client is None:
+            client = self._async_http[loop] = httpx.AsyncClient(
+                timeout=30, limits=_HTTP_LIMITS, http2=_HTTP2
+            )
+        return client
+
+    async def aclose(self) -> None:
+        """Close the async HTTP client opened on the running loop, if any."""
+        client = self._async_http.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def _http_client(self) -> httpx.Client:
+        with self._http_lock:
+            if self._http is None:
+                self._http = httpx.Client(timeout=30, limits=_HTTP_LIMITS, http2=_HTTP2)
+            return self._http
+
     def _call_http_sync(self, server: MCPServer, payload: dict[str, Any]) -> dict[str, Any]:
-        with httpx.Client(timeout=30) as client:
-            res = client.post(server.endpoint, json=payload)
-            res.raise_for_status()
-            return res.json()
+        res = self._http_client().post(server.endpoint, json=payload)
+        res.raise_for_status()
+        return res.json()
 
     def _call_stdio(self, server: MCPServer, payload: dict[str, Any]) -> dict[str, Any]:
-        with server._lock:
-            server._request_id += 1
-            message = {
-                "jsonrpc": "2.0",
-                "id": server._request_id,
-                "method": "tools/call",
-                "params": payload
-            }
-            self._send_message(server, message)
-            response = self._read_response(server)
+        message = {
+            "jsonrpc": "2.0",
+            "id": next(server._ids),
+            "method": "tools/call",
+            "params": payload
+        }
+        response = self._request(server, message)
         
         if "error" in response:
             raise RuntimeError(f"MCP error: {response['error']}")
         
         return response.get("result", {})
 
-    def _read_response(self, server: MCPServer) -> dict:
-        if not server._process or not server._process.stdout:
-            raise RuntimeError(f"Server {server.name} not initialized")
-        line = server._process.stdout.readline()
-        if not line:
-            raise RuntimeError(f"Server {server.name} closed connection")
-        return json.loads(line.strip())
-
     def list_tools(self, server_name: str) -> list[dict]:
         self.initialize()
         
@@ -235,20 +330,22 @@ class MCPRegistry:
             raise ValueError(f"MCP server not found: {server_name}")
         
         if server.type == "stdio":
-            with server._lock:
-                message = {
-                    "jsonrpc": "2.0",
-                    "id": 2,
-                    "method": "tools/list",
-                    "params": {}
-                }
-                self._send_message(server, message)
-                response = self._read_response(server)
+            message = {
+                "jsonrpc": "2.0",
+                "id": next(server._ids),
+                "method": "tools/list",
+                "params": {}
+            }
+            response = self._request(server, message)
             return response.get("result", {}).get("tools", [])
         
         return [{"name": t.name, "description": t.description} for t in server.tools]
 
     def shutdown(self) -> None:
+        with self._http_lock:
+            if self._http is not None:
+                self._http.close()
+                self._http = None
         for server in self.servers.values():
             if server._process:
                 server._process.terminate()
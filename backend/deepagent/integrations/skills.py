@@ -1,13 +1,18 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import threading
 from dataclasses import dataclass
 from typing import Any
 
 import httpx
+import orjson
 
+# Keep-alive pool shared by every skill call so connections are reused across calls
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64)
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class Skill:
     name: str
     endpoint: str
@@ -16,21 +21,38 @@ class Skill:
 class SkillRegistry:
     def __init__(self, skills: list[Skill] | None = None) -> None:
         self.skills = {s.name: s for s in (skills or [])}
+        self._http: httpx.Client | None = None
+        self._http_lock = threading.Lock()
 
     @classmethod
     def from_env(cls, raw: str | None) -> "SkillRegistry":
         if not raw:
             return cls([])
-        data = json.loads(raw)
+        data = orjson.loads(raw)
         skills = [Skill(**item) for item in data]
         return cls(skills)
 
-    async def call(self, skill_name: str, payload: dict[str, Any]) -> dict[str, Any]:
+    def _http_client(self) -> httpx.Client:
+        with self._http_lock:
+            if self._http is None:
+                self._http = httpx.Client(timeout=30, limits=_HTTP_LIMITS)
+            return self._http
+
+    def call_sync(self, skill_name: str, payload: dict[str, Any]) -> dict[str, Any]:
         skill = self.skills.get(skill_name)
         if not skill:
             raise ValueError(f"Skill not found: {skill_name}")
-        async with httpx.AsyncClient(timeout=30) as client:
-            res = await client.post(skill.endpoint, json=payload)
-            res.raise_for_status()
-            return res.json()
+        res = self._http_client().post(skill.endpoint, json=payload)
+        res.raise_for_status()
+        return res.json()
+
+    async def call(self, skill_name: str, payload: dict[str, Any]) -> dict[str, Any]:
+        # Shares the sync pool: an AsyncClient would be tied to whichever loop first used it
+        return await asyncio.to_thread(self.call_sync, skill_name, payload)
+
+    def close(self) -> None:
+        with self._http_lock:
+            if self._http is not None:
+                self._http.close()
+                self._http = None
 
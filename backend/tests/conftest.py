@@ -0,0 +1,97 @@
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from deepagent.common.config import Settings, get_settings
+from deepagent.core.agent import DeepAgent
+from deepagent.core.planner import PlanOutput
+from deepagent.core.todos import TodoStore
+
+_MODELS_YAML = b"""\
+providers:
+  zhipu:
+    model: glm-4-flash
+    temperature: 0.5
+    max_retries: 5
+    models:
+      chat:
+        model: glm-4
+      plan:
+        model: glm-4-plus
+        temperature: 0.1
+      summary:
+        model: glm-4-flash
+        temperature: 0.2
+  openai:
+    model: gpt-4
+    api_key_env: TEST_OPENAI_API_KEY
+    base_url: https://example.invalid/v1
+    models:
+      chat:
+        model: gpt-4o
+"""
+
+
+@pytest.fixture(scope="session")
+def models_yaml_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("cfg") / "models.yaml"
+    path.write_bytes(_MODELS_YAML)
+    return path
+
+
+@pytest.fixture(scope="session")
+def settings(models_yaml_path):
+    # Built directly so the process-wide get_settings() cache is left alone
+    return Settings(model_config_path=str(models_yaml_path))
+
+
+@pytest.fixture
+def fresh_settings(models_yaml_path, monkeypatch):
+    """
+    Returns a function that applies env overrides and re-reads get_settings(), for tests that
+    depend on module-level state reading it (e.g. the memory store path).
+    """
+    def load(**env: str):
+        monkeypatch.setenv("DEEPAGENT_MODEL_CONFIG", str(models_yaml_path))
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        get_settings.cache_clear()
+        return get_settings()
+
+    yield load
+    get_settings.cache_clear()
+
+
+class FakeChatModel(GenericFakeChatModel):
+    """Replies with the given messages in order; tools are accepted and never called."""
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+@pytest.fixture
+def make_agent(fresh_settings, tmp_path, monkeypatch):
+    """
+    Returns a function building a DeepAgent whose chat model answers with `replies` in order.
+    Memory, checkpoints and todos live under tmp_path, and planning is skipped.
+    """
+    async def no_plan(self, message):
+        return PlanOutput(plan=[], todos=[], summary="")
+
+    monkeypatch.setattr(DeepAgent, "aplan", no_plan)
+
+    def make(replies, **env: str):
+        settings = fresh_settings(
+            ZHIPU_API_KEY="test_key",
+            DEEPAGENT_MEMORY_STORE=str(tmp_path / "memory.json"),
+            DEEPAGENT_MEMORY_DB=str(tmp_path / "db" / "checkpoints.db"),
+            **env,
+        )
+        agent = DeepAgent(settings=settings, todo_store=TodoStore(str(tmp_path / "todos.json")))
+        agent.chat_model = FakeChatModel(messages=iter([AIMessage(content=r) for r in replies]))
+        agents.append(agent)
+        return agent
+
+    agents: list[DeepAgent] = []
+    yield make
+    for agent in agents:
+        agent.close_sync_loop()
@@ -0,0 +1,31 @@
+import asyncio
+
+from deepagent.core.memory import create_checkpointer, store_iter_type
+
+
+def test_invoke_many_runs_turns_in_order(make_agent):
+    agent = make_agent(["first reply", "second reply", "third reply"])
+    results = agent.invoke_many("thread-1", "user-1", ["question one", "question two", "question three"])
+
+    assert [r["reply"] for r in results] == ["first reply", "second reply", "third reply"]
+
+    # Each turn is recorded in the memory store, in order
+    turns = [item["value"] for item in store_iter_type("user-1", "conversation")]
+    assert [(t["user_message"], t["agent_reply"]) for t in turns] == [
+        ("question one", "first reply"),
+        ("question two", "second reply"),
+        ("question three", "third reply"),
+    ]
+
+    # The thread's checkpoint carries the whole conversation, so later turns saw earlier ones
+    async def checkpointed_messages():
+        async with create_checkpointer("thread-1") as checkpointer:
+            graph = agent._get_agent("thread-1").copy(update={"checkpointer": checkpointer})
+            state = await graph.aget_state({"configurable": {"thread_id": "thread-1"}})
+        return [m.content for m in state.values["messages"] if m.type in ("human", "ai")]
+
+    assert asyncio.run(checkpointed_messages()) == [
+        "question one", "first reply",
+        "question two", "second reply",
+        "question three", "third reply",
+    ]
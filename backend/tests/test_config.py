@@ -1,6 +1,6 @@
 
-from deepagent.config import Settings
-from deepagent.logger import get_logger
+from deepagent.common.config import Settings
+from deepagent.common.logger import get_logger
 
 
 def test_config_defaults():
@@ -14,7 +14,7 @@ def test_logger_creation(tmp_path):
     settings = Settings(log_dir=str(tmp_path), debug=True)
     # Patch get_settings to return our test settings
     from unittest.mock import patch
-    with patch("deepagent.logger.get_settings", return_value=settings):
+    with patch("deepagent.common.logger.get_settings", return_value=settings):
         logger = get_logger("test.logger")
         assert logger.name == "test.logger"
         logger.info("Test message")
@@ -22,3 +22,16 @@ def test_logger_creation(tmp_path):
         # Check if file created
         log_file = tmp_path / "backend.log"
         assert log_file.exists()
+
+def test_console_masks_secrets_in_args(tmp_path, capsys):
+    # A fresh log dir gets its own console handler, bound to the captured stdout
+    settings = Settings(log_dir=str(tmp_path), log_level="debug")
+    from unittest.mock import patch
+    with patch("deepagent.common.logger.get_settings", return_value=settings):
+        logger = get_logger("test.logger.secrets")
+        logger.info("Request payload: %s", '{"api_key": "sk-secret", "query": "weather"}')
+
+    out = capsys.readouterr().out
+    assert "sk-secret" not in out
+    assert '"api_key": "***"' in out
+    assert '"query": "weather"' in out
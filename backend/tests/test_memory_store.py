@@ -0,0 +1,31 @@
+import multiprocessing
+import os
+
+from deepagent.core import memory
+
+WORKERS = 4
+ITEMS_PER_WORKER = 40
+
+
+def _write_items(store_path: str, worker: int) -> None:
+    os.environ["DEEPAGENT_MEMORY_STORE"] = store_path
+    # Compact often so processes keep replacing the snapshot under each other
+    memory.JOURNAL_COMPACT_ITEMS = 7
+    store = memory.create_store()
+    for i in range(ITEMS_PER_WORKER):
+        memory.store_put(store, "user-1", {"worker": worker, "i": i})
+
+
+def test_concurrent_processes_keep_every_item(tmp_path, fresh_settings):
+    store_path = str(tmp_path / "memory.json")
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=_write_items, args=(store_path, w)) for w in range(WORKERS)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+        assert p.exitcode == 0
+
+    fresh_settings(DEEPAGENT_MEMORY_STORE=store_path)
+    saved = [(item["value"]["worker"], item["value"]["i"]) for item in memory.store_all("user-1")]
+    assert sorted(saved) == [(w, i) for w in range(WORKERS) for i in range(ITEMS_PER_WORKER)]
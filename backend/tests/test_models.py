@@ -1,26 +1,10 @@
 
-from deepagent.config import Settings
-from deepagent.models import ModelRouter, ModelSpec
+from deepagent.common.config import Settings
+from deepagent.core.models import ModelRouter, ModelSpec
 
 
-def test_model_router_from_config(tmp_path):
-    config_file = tmp_path / "models.yaml"
-    config_file.write_text("""
-defaults:
-    provider: zhipu
-    model: glm-4-flash
-    temperature: 0.5
-    max_retries: 5
-models:
-    chat:
-        model: glm-4
-    plan:
-        provider: openai
-        model: gpt-4
-    """, encoding="utf-8")
-    
-    settings = Settings()
-    router = ModelRouter.from_config(str(config_file), settings)
+def test_model_router_from_config(models_yaml_path, settings):
+    router = ModelRouter.from_config(str(models_yaml_path), settings)
     
     # Test Defaults
     assert router.defaults.provider == "zhipu"
@@ -30,18 +14,41 @@ models:
     chat_spec = router.specs["chat"]
     assert chat_spec.model == "glm-4"
     assert chat_spec.provider == "zhipu" # inherited
+    assert chat_spec.max_retries == 5 # inherited
     
     plan_spec = router.specs["plan"]
-    assert plan_spec.provider == "openai"
-    assert plan_spec.model == "gpt-4"
+    assert plan_spec.model == "glm-4-plus"
+    assert plan_spec.temperature == 0.1
+
+def test_model_router_selects_provider(models_yaml_path, settings):
+    settings = settings.model_copy(update={"model_provider": "openai"})
+    router = ModelRouter.from_config(str(models_yaml_path), settings)
+    
+    assert router.defaults.provider == "openai"
+    assert router.defaults.base_url == "https://example.invalid/v1"
+    assert router.specs["chat"].model == "gpt-4o"
+    assert router.specs["chat"].api_key_env == "TEST_OPENAI_API_KEY" # inherited
 
 def test_model_adapter_creation():
     settings = Settings(zhipu_api_key="test_key")
     spec = ModelSpec(provider="zhipu", model="glm-4-flash", temperature=0.1)
     
-    from deepagent.models import ZhipuAdapter
+    from deepagent.core.models import ZhipuAdapter
     adapter = ZhipuAdapter()
     model = adapter.create(spec, settings)
     
     assert model.model_name == "glm-4-flash"
     assert model.temperature == 0.1
+
+def test_model_router_reads_api_keys_when_built(models_yaml_path, settings, monkeypatch):
+    settings = settings.model_copy(update={"model_provider": "openai"})
+    
+    monkeypatch.setenv("TEST_OPENAI_API_KEY", "key-1")
+    router = ModelRouter.from_config(str(models_yaml_path), settings)
+    assert router.defaults._api_key.get_secret_value() == "key-1"
+    
+    # A router built after the environment changes sees the new key
+    monkeypatch.setenv("TEST_OPENAI_API_KEY", "key-2")
+    router = ModelRouter.from_config(str(models_yaml_path), settings)
+    assert router.defaults._api_key.get_secret_value() == "key-2"
+    assert router.specs["chat"]._api_key.get_secret_value() == "key-2"
@@ -0,0 +1,60 @@
+import multiprocessing
+
+from deepagent.api.sessions import SessionStore
+
+WORKERS = 4
+THREADS_PER_WORKER = 30
+
+
+def _add_sessions(path: str, worker: int) -> None:
+    store = SessionStore(path)
+    # Compact often so processes keep replacing the snapshot under each other
+    store.COMPACT_EVERY = 7
+    for i in range(THREADS_PER_WORKER):
+        store.add(f"user-{worker}", f"thread-{i}")
+
+
+def test_sessions_reload_from_journal(tmp_path):
+    path = str(tmp_path / "sessions.json")
+    store = SessionStore(path, max_threads_per_user=2)
+    store.add("user-1", "thread-1")
+    store.add("user-1", "thread-2")
+    store.add("user-2", "thread-1")
+    store.add("user-1", "thread-3")
+
+    reloaded = SessionStore(path, max_threads_per_user=2)
+    assert reloaded.list("user-1") == ["thread-2", "thread-3"]
+    assert reloaded.list("user-2") == ["thread-1"]
+
+
+def test_sessions_are_not_evicted_by_default(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.json"))
+    for i in range(150):
+        store.add("user-1", f"thread-{i}")
+
+    assert store.list("user-1") == [f"thread-{i}" for i in range(150)]
+
+
+def test_active_thread_moves_to_end_and_survives_eviction(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.json"), max_threads_per_user=2)
+    store.add("user-1", "thread-1")
+    store.add("user-1", "thread-2")
+    store.add("user-1", "thread-1")
+    store.add("user-1", "thread-3")
+
+    assert store.list("user-1") == ["thread-1", "thread-3"]
+
+
+def test_concurrent_processes_keep_every_session(tmp_path):
+    path = str(tmp_path / "sessions.json")
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=_add_sessions, args=(path, w)) for w in range(WORKERS)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+        assert p.exitcode == 0
+
+    store = SessionStore(path)
+    for w in range(WORKERS):
+        assert store.list(f"user-{w}") == [f"thread-{i}" for i in range(THREADS_PER_WORKER)]
@@ -149,16 +149,22 @@ export default function Chat() {
             setTodos(event.todos);
             break;
 
+          case "todo_update":
+            setTodos((prev) =>
+              prev.map((todo) => (todo.id === event.id ? { ...todo, status: event.status } : todo))
+            );
+            break;
+
           case "status":
             setStatusText(event.content);
             break;
 
           case "tool_start":
-            setStatusText(`Running tool: ${event.tool}...`);
+            setStatusText(event.status ?? `Running tool: ${event.tool}...`);
             break;
 
           case "tool_end":
-            setStatusText(`Finished tool: ${event.tool}`);
+            setStatusText(event.status ?? `Finished tool: ${event.tool}`);
             break;
             
           case "error":